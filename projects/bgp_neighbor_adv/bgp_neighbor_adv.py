@@ -19,6 +19,27 @@ import csv
 #import ipaddress for network calculations
 import ipaddress
 
+# import sys to intern the strings repeated across bgp neighbors
+import sys
+
+# import concurrent futures to collect from several devices at once
+import concurrent.futures
+
+# import json to store the prefix baselines between runs
+import json
+
+# import math for the standard deviation of the prefix baselines
+import math
+
+# import os to replace the prefix baselines file atomically
+import os
+
+# import threading to share the neighbor cache between workers
+import threading
+
+# import time to stamp when the bgp neighbors were polled
+import time
+
 # initiate colorama which is required for windows
 # autoreset also allows to clear colorama settings per print statement
 colorama.init(autoreset=True)
@@ -113,124 +134,655 @@ def _read_file(filename):
     # return user items
     return user_items
         
+class BGPNeighbor:
+    """ bgp neighbor
+    compact record of a single bgp neighbor
+
+    __slots__ removes the per record dictionary and the strings that repeat
+    across neighbors (state, as, router id, description) are interned so a
+    whole fleet's neighbor tables share one copy of each """
+
+    __slots__ = ('bgp_neighbor', 'bgp_state', 'bgp_prefixes_received', 'description',
+                 'bgp_neighbor_as', 'router_id', 'neighbor_uptime')
+
+    def __init__(self, bgp_neighbor):
+        # neighbor ip address
+        self.bgp_neighbor = bgp_neighbor
+
+        # bgp state, i.e. Established or Active
+        self.bgp_state = ''
+
+        # int of prefixes received, None if the neighbor did not report any
+        self.bgp_prefixes_received = None
+
+        # description will not show up in show ip bgp neighbor unless it is set
+        self.description = 'N/A'
+
+        # remote as number
+        self.bgp_neighbor_as = ''
+
+        # remote router id
+        self.router_id = ''
+
+        # int of seconds the session has been up for
+        self.neighbor_uptime = 0
+
+    def uptime(self):
+        """ uptime
+        formats the session uptime the same way cisco does
+
+        example: 01:28:36, 1d02h, 2w3d """
+
+        # split the uptime into its components
+        minutes, seconds = divmod(self.neighbor_uptime, 60)
+        hours, minutes = divmod(minutes, 60)
+        days, hours = divmod(hours, 24)
+        weeks, days = divmod(days, 7)
+
+        if weeks:
+            return '%dw%dd' % (weeks, days)
+        elif days:
+            return '%dd%02dh' % (days, hours)
+
+        return '%02d:%02d:%02d' % (hours, minutes, seconds)
+
+# seconds in each unit of a cisco uptime such as 1d02h or 2w3d
+UPTIME_UNITS = {'y': 31536000, 'w': 604800, 'd': 86400, 'h': 3600, 'm': 60, 's': 1}
+
+def _parse_uptime(raw_uptime):
+    """ _parse_uptime
+    converts a cisco uptime into seconds
+
+    example: 01:28:36 -> 5316, 1d02h -> 93600, never -> 0 """
+
+    # initialize the uptime
+    uptime = 0
+
+    # example: 01:28:36
+    if raw_uptime.count(':') == 2:
+        hours, minutes, seconds = raw_uptime.split(':')
+        if (hours + minutes + seconds).isdecimal():
+            uptime = int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+        return uptime
+
+    # example: 1d02h or 2w3d
+    number = ''
+    for character in raw_uptime:
+        if character.isdecimal():
+            number += character
+        elif number and character in UPTIME_UNITS:
+            uptime += int(number) * UPTIME_UNITS[character]
+            number = ''
+
+    return uptime
+
+# seconds a poll may lag behind the show command on top of the uptime resolution
+UPTIME_SLACK = 60
+
+def _uptime_resolution(uptime):
+    """ _uptime_resolution
+    seconds of precision lost when cisco formats an uptime
+    cisco drops the smaller units once the session gets older
+
+    example: 01:28:36 -> 1, 1d02h -> 3600, 2w3d -> 86400, 1y2w -> 604800 """
+
+    if uptime < UPTIME_UNITS['d']:
+        return UPTIME_UNITS['s']
+    elif uptime < UPTIME_UNITS['w']:
+        return UPTIME_UNITS['h']
+    elif uptime < UPTIME_UNITS['y']:
+        return UPTIME_UNITS['d']
+
+    return UPTIME_UNITS['w']
+
 def _parse_bgp_neighbor(raw_bgp_neighbor):
     """ _parse_bgp_neighbor
-    parses the show ip bgp neighbor output and writes to the command prompt
-    
+    parses the show ip bgp neighbor output into bgp neighbor records
+
+    returns
+    -------
+    bgp_neighbor_dict
+        dict representing the parsed data of show ip bgp neighbor
+        will contain the neighbor ip as key and a BGPNeighbor record as value
+
     example:
     Neighbor 172.31.6.2 in state Established, has 3 routes has description  Router 3
     in New York, is in AS 65500, has a router ID of 10.2.0.1, and has been up for 0
     6:01:43
     """
-    
-    # initalize dictionary that will contain the bgp routing table information
+
+    # initalize dictionary that will contain the bgp neighbor information
     # of each device
     bgp_neighbor_dict = {}
-    
-    # description will not show up in show ip bgp neighbor unless it is set
-    # so initialize variable so that it can be referenced in the event there
-    # is no description
-    description = ''
-    bgp_neighbor_ip = ''
-    
+
+    # initialize the record of the neighbor currently being parsed
+    bgp_neighbor = None
+
     # iterate over each line and check for interesting data
     for line in raw_bgp_neighbor.splitlines():
-    
-        # check if bgp_neighbor_ip has already been defined
-        if bgp_neighbor_ip and 'bgp neighbor' in line.lower():
-        
-            # store information in dictionary
-            #description will not show up in output if not set
-            if not description:
-                description = 'N/A'
-                
-            bgp_neighbor_dict[bgp_neighbor_ip] = {'bgp_neighbor': bgp_neighbor_ip,
-                                        'bgp_state': bgp_state,
-                                        'bgp_prefixes_received': bgp_prefixes_received,
-                                        'description': description,
-                                        'bgp_neighbor_as': bgp_neighbor_as,
-                                        'router_id': router_id,
-                                        'neighbor_uptime': neighbor_uptime
-                                       }
-            
-            # Reset description parameter, as if this is user not set, the output
-            # for description will not be shown
-            description = ''
-        
+
         # strip white space
         line = line.strip()
-        
+        lowered_line = line.lower()
+
+        # example line: BGP neighbor is 172.31.6.2,  remote AS 65500, external link
+        # every neighbor starts with this line so start a new record
+        if lowered_line.startswith('bgp neighbor'):
+            # split based on white space
+            parameters = line.replace(',', '').split()
+            bgp_neighbor = None
+
+            # iterate over each parameter
+            for parameter in parameters:
+                if parameter.count('.') == 3 and bgp_neighbor is None:
+                    bgp_neighbor = BGPNeighbor(parameter)
+                    bgp_neighbor_dict[parameter] = bgp_neighbor
+                elif parameter.isdecimal() and bgp_neighbor is not None:
+                    bgp_neighbor.bgp_neighbor_as = sys.intern(parameter)
+                    break
+
+            continue
+
+        # skip lines until the first neighbor is found
+        if bgp_neighbor is None:
+            continue
+
         # example line: Description: Router 2 in Las Vegas
         # obtain description from output
-        if 'description' in line.lower():
-            description = line.split(':')[1]
-            continue
-        
+        if lowered_line.startswith('description'):
+            bgp_neighbor.description = sys.intern(line.split(':', 1)[1].strip())
+
         # example line: BGP state = Established, up for 01:28:36
-        # obtain bgp state from output
-        elif 'bgp state' in line.lower():
-            new_line = line.split(',')[0]
-            bgp_state = new_line.split('=')[1].strip()
-        
+        # obtain bgp state and uptime from output
+        elif 'bgp state' in lowered_line:
+            bgp_state = line.split(',')[0].split('=')[1].strip()
+            bgp_neighbor.bgp_state = sys.intern(bgp_state)
+
+            if 'up for' in lowered_line:
+                raw_uptime = line.split('up for')[-1].strip().split()[0]
+                bgp_neighbor.neighbor_uptime = _parse_uptime(raw_uptime)
+
         # example line: Prefixes Total:     3       4
         # obtain advertised prefixes inbound and outbound from output
-        elif 'prefixes total' in line.lower():
-            parameters = line.split(':')
-            parameters = parameters[1].split()
-            bgp_prefixes_sent = parameters[0]
-            bgp_prefixes_received = parameters[1]
-            continue
-        
-        # example line: For address family: IPv4 Unicast
-        # get address family from output
-        elif 'address family' in line.lower():
-            address_family = line.split(':')[1]
+        elif 'prefixes total' in lowered_line:
+            parameters = line.split(':')[1].split()
+            if len(parameters) > 1 and parameters[1].isdecimal():
+                bgp_neighbor.bgp_prefixes_received = int(parameters[1])
+
+        # example line: BGP version 4, remote router ID 10.2.0.1
+        elif 'router id' in lowered_line:
+            for parameter in line.split():
+                if parameter.count('.') == 3:
+                    bgp_neighbor.router_id = sys.intern(parameter)
+
+    return bgp_neighbor_dict
+
+
+def _parse_bgp_summary(raw_bgp_summary):
+    """ _parse_bgp_summary
+    parses the show ip bgp summary output for the local router id and as
+
+    returns
+    -------
+    router_id
+        str variable representing the local bgp router id
+    local_as
+        str variable representing the local as number
+
+    example line:
+    BGP router identifier 10.1.0.1, local AS number 65501
+    """
+
+    # initialize the local router id and as in case bgp is not running
+    router_id = ''
+    local_as = ''
+
+    # iterate over each line and check for the router identifier line
+    for line in raw_bgp_summary.splitlines():
+        if 'router identifier' not in line.lower():
             continue
-            
+
         # split based on white space
-        parameters = line.split()
-            
+        parameters = line.replace(',', '').split()
+
         # iterate over each parameter
         for parameter in parameters:
-           
-            # example line: BGP version 4, remote router ID 10.2.0.1
-            if 'router id' in line.lower():
-            
-                if parameter.count('.') == 3:
-                    router_id = parameter
-                else:
-                    continue
-            
-            # example line: BGP state = Established, up for 01:28:36
-                
-            elif 'bgp state' in line.lower() and parameter.count(':') >= 2:
-                neighbor_uptime = parameter.replace(',','')
-                continue
-            # example line: BGP neighbor is 172.31.6.2,  remote AS 65500, external link
-            elif 'bgp neighbor' in line.lower():
-                
-                if parameter.count('.') == 3:
-                    bgp_neighbor_ip = parameter.replace(',','')
-                    continue
-                    
-                elif parameter.replace(',','').isdecimal():
-                    bgp_neighbor_as = parameter.replace(',','')
-                    continue
-    
-    # store information in dictionary
-    if not description:
-        description = 'N/A'
-        
-    bgp_neighbor_dict[bgp_neighbor_ip] = {'bgp_state': bgp_state,
-                                          'bgp_prefixes_received': bgp_prefixes_received,
-                                          'description': description,
-                                          'bgp_neighbor_as': bgp_neighbor_as,
-                                          'router_id': router_id,
-                                          'neighbor_uptime': neighbor_uptime
-                                         }
-    
-    return bgp_neighbor_dict
-                    
+            # the router id is the only dotted parameter
+            if parameter.count('.') == 3:
+                router_id = parameter
+
+            # the local as is the only decimal parameter
+            elif parameter.isdecimal():
+                local_as = parameter
+
+        break
+
+    return router_id, local_as
+
+class BGPSessionGraph:
+    """ bgp session graph
+    joins the bgp neighbor records of every device into one session graph
+    keyed by router id so both ends of a session can be compared """
+
+    def __init__(self):
+        # set up local as datastructure keyed by router id
+        self.router_as = {}
+
+        # set up device datastructure keyed by router id
+        self.router_device = {}
+
+        # set up session datastructure
+        # local router id -> remote router id -> list of sessions
+        self.sessions = {}
+
+    def add_device(self, device, router_id, local_as):
+        """ add device
+        registers a polled device as a node of the session graph """
+
+        self.router_as[router_id] = local_as
+        self.router_device[router_id] = device
+        self.sessions.setdefault(router_id, {})
+
+    def add_session(self, router_id, bgp_neighbor):
+        """ add session
+        adds one side of a bgp session seen from the device owning router_id
+        the BGPNeighbor record itself is kept as the session """
+
+        # sessions that are not up report a remote router id of 0.0.0.0
+        # fall back to the neighbor ip so the session is still tracked
+        remote_router_id = bgp_neighbor.router_id
+        if not remote_router_id or remote_router_id == '0.0.0.0':
+            remote_router_id = bgp_neighbor.bgp_neighbor
+
+        # add the session to the adjacency of the local router
+        remote_sessions = self.sessions.setdefault(router_id, {})
+        remote_sessions.setdefault(remote_router_id, []).append(bgp_neighbor)
+
+    def check_consistency(self):
+        """ check consistency
+        compares both ends of every session in the graph
+
+        returns
+        -------
+        issues
+            list representing every one-sided or mismatched session
+            each entry in list will be a dictionary
+
+            example format listed below:
+
+            [
+                { 'device': '192.168.160.132', 'bgp_neighbor': '172.31.6.3',
+                  'router_id': '172.31.6.3', 'issue': 'one-sided session' }
+            ]
+
+        """
+
+        # initialize issues
+        issues = []
+
+        # iterate through the sessions of every local router
+        for router_id, remote_sessions in self.sessions.items():
+            device = self.router_device.get(router_id, router_id)
+
+            for remote_router_id, sessions in remote_sessions.items():
+                for session in sessions:
+                    issue = ''
+
+                    # a session that is not established is broken on both ends
+                    if session.bgp_state.lower() != 'established':
+                        issue = 'session in state ' + session.bgp_state
+
+                    # remote router was not polled so only one side is known
+                    elif remote_router_id not in self.router_as:
+                        continue
+
+                    # remote router was polled but has no session back to us
+                    elif router_id not in self.sessions[remote_router_id]:
+                        issue = 'one-sided session'
+
+                    # remote router's local as does not match the configured as
+                    elif session.bgp_neighbor_as != self.router_as[remote_router_id]:
+                        issue = 'remote as ' + session.bgp_neighbor_as
+                        issue += ' does not match local as '
+                        issue += self.router_as[remote_router_id]
+
+                    # remote router sees the session in a different state
+                    elif not any(reverse_session.bgp_state.lower() == 'established'
+                                 for reverse_session in self.sessions[remote_router_id][router_id]):
+                        issue = 'state mismatch'
+
+                    if issue:
+                        issues.append({'device': device,
+                                       'bgp_neighbor': session.bgp_neighbor,
+                                       'router_id': remote_router_id,
+                                       'issue': issue
+                                      })
+
+        return issues
+
+    def _established_neighbors(self, router_id):
+        """ established neighbors
+        yields the remote router ids with at least one established session """
+
+        for remote_router_id, sessions in self.sessions.get(router_id, {}).items():
+            if any(session.bgp_state.lower() == 'established' for session in sessions):
+                yield remote_router_id
+
+    def reachable(self, router_id):
+        """ reachable
+        breadth first search over established sessions
+
+        returns
+        -------
+        reachable_routers
+            set representing every router id reachable from router_id
+        """
+
+        # initialize the search
+        reachable_routers = {router_id}
+        queue = collections.deque([router_id])
+
+        while queue:
+            current_router_id = queue.popleft()
+
+            for remote_router_id in self._established_neighbors(current_router_id):
+                if remote_router_id not in reachable_routers:
+                    reachable_routers.add(remote_router_id)
+                    queue.append(remote_router_id)
+
+        return reachable_routers
+
+    def as_path(self, source_router_id, destination_router_id):
+        """ as path
+        finds the shortest chain of established sessions between two routers
+
+        returns
+        -------
+        as_path
+            list representing the as numbers crossed from source to destination
+            consecutive routers in the same as are collapsed into one hop
+            empty if the destination is not reachable
+
+            example format listed below:
+
+            ['65501', '65500', '65502']
+        """
+
+        # initialize the search with the previous hop of each visited router
+        previous_hop = {source_router_id: None}
+        queue = collections.deque([source_router_id])
+
+        while queue and destination_router_id not in previous_hop:
+            current_router_id = queue.popleft()
+
+            for remote_router_id in self._established_neighbors(current_router_id):
+                if remote_router_id not in previous_hop:
+                    previous_hop[remote_router_id] = current_router_id
+                    queue.append(remote_router_id)
+
+        # destination is not reachable
+        if destination_router_id not in previous_hop:
+            return []
+
+        # walk back from the destination to the source
+        router_path = []
+        current_router_id = destination_router_id
+        while current_router_id is not None:
+            router_path.append(current_router_id)
+            current_router_id = previous_hop[current_router_id]
+        router_path.reverse()
+
+        # translate the router path into an as path
+        as_path = []
+        for hop_index, router_id in enumerate(router_path):
+            local_as = self.router_as.get(router_id, '')
+
+            # routers that were not polled are only known through their peer
+            if not local_as and hop_index:
+                for session in self.sessions[router_path[hop_index - 1]][router_id]:
+                    local_as = session.bgp_neighbor_as
+
+            # collapse consecutive routers in the same as
+            if not as_path or as_path[-1] != local_as:
+                as_path.append(local_as)
+
+        return as_path
+
+def _query_bgp_session_graph(bgp_session_graph):
+    """ query bgp session graph
+    prompts the user for reachability and as path queries against the graph """
+
+    # keep running till user decides to exit out
+    while True:
+        usr_msg = "\nPlease provide a router id, or a source and destination"
+        usr_msg += " router id separated by a comma (type 'q' to quit): "
+        usr_inp = input(usr_msg).strip()
+
+        # quit loop if conditions are met
+        if usr_inp.lower() == 'q' or not usr_inp:
+            break
+
+        # a pair of router ids is an as path query
+        if ',' in usr_inp:
+            source_router_id = usr_inp.split(',')[0].strip()
+            destination_router_id = usr_inp.split(',')[-1].strip()
+
+            as_path = bgp_session_graph.as_path(source_router_id, destination_router_id)
+
+            if as_path:
+                usr_msg = "AS Path: " + ' '.join(as_path)
+                print(colorama.Fore.CYAN + usr_msg)
+            else:
+                usr_msg = destination_router_id + " is not reachable from "
+                usr_msg += source_router_id
+                print(colorama.Fore.RED + usr_msg)
+
+        # a single router id is a reachability query
+        else:
+            reachable_routers = bgp_session_graph.reachable(usr_inp)
+            reachable_routers.discard(usr_inp)
+
+            usr_msg = "Reachable Routers: " + ', '.join(sorted(reachable_routers))
+            print(colorama.Fore.CYAN + usr_msg)
+
+class PrefixBaselines:
+    """ prefix baselines
+    keeps a rolling baseline of the prefixes received from every bgp neighbor
+    across runs and flags neighbors that deviate sharply from their baseline
+
+    each baseline is an exponentially weighted mean and variance so a new
+    sample is folded in with a constant amount of work and no history is kept """
+
+    def __init__(self, filename, alpha=0.2, threshold=4.0, min_samples=5):
+        # store the file the baselines are kept in between runs
+        self.filename = filename
+
+        # weight of the newest sample in the rolling baseline
+        self.alpha = alpha
+
+        # number of standard deviations that count as a sharp deviation
+        self.threshold = threshold
+
+        # number of samples required before a baseline is trusted
+        self.min_samples = min_samples
+
+        # set up baselines datastructure
+        # 'device,neighbor' -> [samples, mean, variance]
+        self.baselines = {}
+
+        try:
+            # open a context handler for the file
+            with open(self.filename, 'r') as baselines_file:
+                self.baselines = json.load(baselines_file)
+        # if file was not found - this is the first run
+        except FileNotFoundError:
+            pass
+
+    def update(self, device, bgp_neighbor_ip, bgp_prefixes_received):
+        """ update
+        folds a new prefix count into the baseline of the neighbor
+
+        returns
+        -------
+        anomaly
+            dict representing the deviation if the prefix count deviates sharply
+            otherwise None
+
+            example format listed below:
+
+            { 'device': '192.168.160.132', 'bgp_neighbor': '172.31.6.1',
+              'prefixes': 3, 'baseline': 812.4 }
+
+        """
+
+        # sessions that are not up do not report a prefix count
+        if not str(bgp_prefixes_received).isdecimal():
+            return None
+
+        prefixes = int(bgp_prefixes_received)
+        key = device + ',' + bgp_neighbor_ip
+
+        # the first sample starts the baseline
+        if key not in self.baselines:
+            self.baselines[key] = [1, float(prefixes), 0.0]
+            return None
+
+        samples, mean, variance = self.baselines[key]
+        deviation = prefixes - mean
+
+        # compare against the baseline before the sample is folded in
+        # a small floor keeps perfectly stable neighbors from flagging on noise
+        anomaly = None
+        spread = max(math.sqrt(variance), 0.05 * mean, 1.0)
+        if samples >= self.min_samples and abs(deviation) > self.threshold * spread:
+            anomaly = {'device': device,
+                       'bgp_neighbor': bgp_neighbor_ip,
+                       'prefixes': prefixes,
+                       'baseline': round(mean, 1)
+                      }
+
+        # fold the sample into the exponentially weighted mean and variance
+        increment = self.alpha * deviation
+        mean = mean + increment
+        variance = (1 - self.alpha) * (variance + deviation * increment)
+
+        self.baselines[key] = [samples + 1, mean, variance]
+
+        return anomaly
+
+    def save(self):
+        """ save
+        writes the baselines to disk for the next run """
+
+        # write to a temporary file first so an interrupted save
+        # does not corrupt the existing baselines
+        with open(self.filename + '.tmp', 'w') as baselines_file:
+            json.dump(self.baselines, baselines_file)
+
+        os.replace(self.filename + '.tmp', self.filename)
+
+class BGPNeighborCache:
+    """ bgp neighbor cache
+    keeps the resolved interface of every bgp neighbor between runs
+
+    an entry stays valid while the session has not reset and its received
+    prefix count has not changed, so stable peers skip the mac and arp table
+    resolution on the next sweep
+
+    a reset is detected from the time the session was established (poll time
+    minus uptime), which only moves later when the session came up again.
+    the uptime of an older session is coarse (1d02h, 2w3d) so the established
+    time is allowed to drift by the resolution of the uptime """
+
+    def __init__(self, filename):
+        # store the file the cache is kept in between runs
+        self.filename = filename
+
+        # workers read and update the cache at the same time
+        self.lock = threading.Lock()
+
+        # set up cache datastructure
+        # 'device,neighbor' -> { 'established': 1581300000, 'resolution': 1,
+        #                        'bgp_prefixes_received': 3,
+        #                        'interface': 'FastEthernet1/2', 'mac_address': 'c201.0f2c.0010' }
+        self.entries = {}
+
+        try:
+            # open a context handler for the file
+            with open(self.filename, 'r') as cache_file:
+                self.entries = json.load(cache_file)
+        # if file was not found - this is the first run
+        except FileNotFoundError:
+            pass
+
+    def get(self, device, bgp_neighbor, poll_time):
+        """ get
+        looks up the resolved interface of a neighbor
+        poll_time is when show ip bgp neighbor was collected
+
+        returns
+        -------
+        host_dict
+            dict representing the cached interface and mac address
+            None if the neighbor is not cached or its entry is stale
+
+            example format listed below:
+
+            {'interface': 'FastEthernet1/0', 'mac_address': '0050.7966.6800'}
+
+        """
+
+        with self.lock:
+            entry = self.entries.get(device + ',' + bgp_neighbor.bgp_neighbor)
+
+        # entries of older runs without an established time are stale as well
+        if entry is None or 'established' not in entry:
+            return None
+
+        # the session has reset since the entry was cached
+        # when it was established more recently than the coarse uptimes allow
+        established = poll_time - bgp_neighbor.neighbor_uptime
+        tolerance = max(entry['resolution'], _uptime_resolution(bgp_neighbor.neighbor_uptime))
+        if established > entry['established'] + tolerance + UPTIME_SLACK:
+            return None
+
+        # the neighbor has changed what it advertises since the entry was cached
+        if bgp_neighbor.bgp_prefixes_received != entry['bgp_prefixes_received']:
+            return None
+
+        return {'interface': entry['interface'], 'mac_address': entry['mac_address']}
+
+    def put(self, device, bgp_neighbor, host_dict, poll_time):
+        """ put
+        caches the resolved interface of a neighbor
+        poll_time is when show ip bgp neighbor was collected """
+
+        # neighbors that could not be resolved are retried on the next run
+        if host_dict['interface'] == 'N/A':
+            return
+
+        with self.lock:
+            self.entries[device + ',' + bgp_neighbor.bgp_neighbor] = {
+                'established': poll_time - bgp_neighbor.neighbor_uptime,
+                'resolution': _uptime_resolution(bgp_neighbor.neighbor_uptime),
+                'bgp_prefixes_received': bgp_neighbor.bgp_prefixes_received,
+                'interface': host_dict['interface'],
+                'mac_address': host_dict['mac_address'],
+            }
+
+    def save(self):
+        """ save
+        writes the cache to disk for the next run """
+
+        # write to a temporary file first so an interrupted save
+        # does not corrupt the existing cache
+        with self.lock:
+            with open(self.filename + '.tmp', 'w') as cache_file:
+                json.dump(self.entries, cache_file)
+
+        os.replace(self.filename + '.tmp', self.filename)
+
 def arp_parse(raw_arp_table):
     """ arp parse
     parses the arp table output into a sorted dictionary 
@@ -389,6 +941,119 @@ def mac_arp_compare(raw_mac_table, host, raw_arp_table=''):
     return host_dict          
         
             
+def _collect_bgp_neighbor(device, device_type, username, password, secret, bgp_neighbor_cache):
+    """ collect bgp neighbor
+    logs into a single device and collects and parses its bgp neighbor information
+    this runs inside a worker thread so several devices are fetched at once
+
+    the mac and arp tables are only collected when a neighbor is missing
+    from the bgp neighbor cache or its cache entry is stale
+
+    returns
+    -------
+    device_result
+        dict representing the parsed data of the device
+
+        example format listed below:
+
+        { 'device': '192.168.160.132', 'router_id': '10.1.0.1', 'local_as': '65501',
+          'bgp_neighbor_dict': { '172.31.6.1': BGPNeighbor },
+          'host_dicts': { '172.31.6.1': { 'interface': 'FastEthernet1/2', ... } } }
+
+    """
+
+    # provide context for user
+    usr_msg = "\nConnecting to " + device.upper()
+    print(colorama.Fore.MAGENTA + usr_msg)
+
+    # build netmiko device profile
+    network_device_profile = {
+        'device_type': device_type,
+        'ip': device,
+        'username': username,
+        'password': password,
+        'secret': secret,
+    }
+
+    # initialize the connection handler of netmiko
+    # the one connection is shared by every command sent to this device
+    net_connect = netmiko.ConnectHandler(**network_device_profile)
+
+    # enter enable mode if required
+    if net_connect.find_prompt().endswith('>'):
+        net_connect.enable()
+
+    # message to user to show bgp route information is being collected
+    usr_msg = "Collecting BGP Neighbor Information from " + device.upper() + "...."
+    print(colorama.Fore.CYAN + usr_msg)
+
+    # stamp the poll so the cache can tell when each session was established
+    poll_time = int(time.time())
+
+    # collect unformatted bgp neighbor information using netmiko
+    raw_bgp_neighbor = net_connect.send_command('show ip bgp neighbor')
+
+    # collect the local router id and as of the device
+    raw_bgp_summary = net_connect.send_command('show ip bgp summary')
+
+    # parse raw output of bgp neighbor table
+    bgp_neighbor_dict = _parse_bgp_neighbor(raw_bgp_neighbor)
+
+    # parse the local router id and as of the device
+    router_id, local_as = _parse_bgp_summary(raw_bgp_summary)
+
+    # fall back to the device itself if bgp did not report a router id
+    if not router_id:
+        router_id = device
+
+    # initialize the interface of every bgp neighbor
+    # neighbors that are unchanged since the last run come from the cache
+    host_dicts = {}
+    for bgp_neighbor_ip, bgp_neighbor in bgp_neighbor_dict.items():
+        host_dict = bgp_neighbor_cache.get(device, bgp_neighbor, poll_time)
+        if host_dict is not None:
+            host_dicts[bgp_neighbor_ip] = host_dict
+
+    # only collect the mac and arp tables if a neighbor still has to be resolved
+    if len(host_dicts) < len(bgp_neighbor_dict):
+        # Retrieve ARP table
+        raw_arp_table = net_connect.send_command('show ip arp')
+
+        # Retrieve CAM Table
+        raw_mac_table = net_connect.send_command('show mac-address-table')
+
+        #check if command syntax is wrong for mac address table
+        #(command differs on IOS and IOS-XE/NXOS)
+        if 'invalid input' in raw_mac_table.lower():
+
+            #try different syntax for mac address table
+            raw_mac_table = net_connect.send_command('show mac address-table')
+
+    # disconnect from the device as soon as the output is collected
+    # so the session is freed while the output is being parsed
+    net_connect.disconnect()
+
+    for bgp_neighbor_ip, bgp_neighbor in bgp_neighbor_dict.items():
+        # skip neighbors that were resolved from the cache
+        if bgp_neighbor_ip in host_dicts:
+            continue
+
+        #initiate mac_arp_compare function to retrieve
+        host_dicts[bgp_neighbor_ip] = mac_arp_compare(raw_mac_table = raw_mac_table,
+                                                      raw_arp_table = raw_arp_table,
+                                                      host = bgp_neighbor_ip
+                                                     )
+
+        # cache the resolved interface for the next run
+        bgp_neighbor_cache.put(device, bgp_neighbor, host_dicts[bgp_neighbor_ip], poll_time)
+
+    return {'device': device,
+            'router_id': router_id,
+            'local_as': local_as,
+            'bgp_neighbor_dict': bgp_neighbor_dict,
+            'host_dicts': host_dicts
+           }
+
 def bgp_neighbor_adv():
     """ main
     main function that is the catalyst of the script by executing all
@@ -407,6 +1072,13 @@ def bgp_neighbor_adv():
     
     # get log filename
     log_filename = input('\nPlease provide an output filename: ').strip()
+
+    # get the number of devices to collect from at the same time
+    max_workers = input('\nPlease provide the number of concurrent sessions (default 8): ').strip()
+
+    # fall back to the default worker budget
+    if not max_workers.isdecimal() or not int(max_workers):
+        max_workers = '8'
         
     # check if log file name ends with csv
     if not log_filename.endswith('.csv'):
@@ -422,7 +1094,25 @@ def bgp_neighbor_adv():
     bgp_neighbor_csv_writer.writerow(['Device', 'BGP Neighbor IP', 'Interface',
                                       'Router ID', 'State', 'Prefixes Received',
                                       'Neighbor AS', 'Uptime', 'Description'])
-                                      
+
+    # initialize the session graph of the whole fleet
+    bgp_session_graph = BGPSessionGraph()
+
+    # load the prefix baselines of previous runs
+    prefix_baselines = PrefixBaselines('prefix_baselines.json')
+
+    # initialize the neighbors that deviate from their baseline
+    prefix_anomalies = []
+
+    # load the resolved interfaces of previous runs
+    bgp_neighbor_cache = BGPNeighborCache('bgp_neighbor_cache.json')
+
+    # initialize the worker pool with a fixed worker budget
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=int(max_workers))
+
+    # initialize the pending device collections
+    futures = {}
+
     # iterate through the devices
     for device in devices:
         # if the user has provided the device type
@@ -434,102 +1124,128 @@ def bgp_neighbor_adv():
             # initialize device type
             # by default set to cisco ios to play it safe
             device_type = 'cisco_ios'
-            
-        # provide context for user
-        usr_msg = "\nConnecting to " + device.upper()
-        print(colorama.Fore.MAGENTA + usr_msg)
-
-        # build netmiko device profile
-        network_device_profile = {
-            'device_type': device_type,
-            'ip': device,
-            'username': username,
-            'password': password,
-            'secret': secret,
-        }
-
-        # initialize the connection handler of netmiko
-        try:
-            net_connect = netmiko.ConnectHandler(**network_device_profile)
-            
-        # in case of authentication failure
-        # user will be informed and the program will exit
-        except netmiko.ssh_exception.NetMikoAuthenticationException:
-            # in case there were any successfully collected
-            # data in the previous network devices
-            # write to the log file to successfully save
-
-            usr_msg = "\nAuthentication Failure - Exiting BGP Parse.\n"
-            print(colorama.Fore.RED + usr_msg)
 
-            # exit program
-            return
+        # hand the device over to the worker pool
+        future = executor.submit(_collect_bgp_neighbor, device, device_type,
+                                 username, password, secret, bgp_neighbor_cache)
+        futures[future] = (device, device_type)
 
-        # in case of device type value error
-        # user will be informed and the program will exit
-        except ValueError:
-            # in case there were any successfully collected
-            # data in the previous network devices
-            # write to the log file to successfully save
+    # initialize the devices that could not be collected
+    failed_devices = []
 
-            usr_msg = "\nDevice Type Failure. Device Type " + device_type
-            usr_msg += " Does Not Exist - Exiting BGP Neighbor Adv.\n"
-            print(colorama.Fore.RED + usr_msg)
+    # write each device to the csv file as soon as its collection completes
+    # a failing device never stops the rest of the sweep
+    try:
+        for future in concurrent.futures.as_completed(futures):
+            device, device_type = futures[future]
 
-            # exit program
-            return
-            
-        # enter enable mode if required
-        if net_connect.find_prompt().endswith('>'):
-            net_connect.enable()
-            
-        # message to user to show bgp route information is being collected
-        usr_msg = "Collecting BGP Neighbor Information...."
-        print(colorama.Fore.CYAN + usr_msg)
-                
-        # collect unformatted bgp neighbor information using netmiko
-        raw_bgp_neighbor = net_connect.send_command('show ip bgp neighbor')
-        
-        # parse raw output of bgp neighbor table
-        bgp_neighbor_dict = _parse_bgp_neighbor(raw_bgp_neighbor)
-        
-        # Retrieve ARP table
-        raw_arp_table = net_connect.send_command('show ip arp')
-            
-        # Retrieve CAM Table
-        raw_mac_table = net_connect.send_command('show mac-address-table')
-            
-        #check if command syntax is wrong for mac address table
-        #(command differs on IOS and IOS-XE/NXOS)
-        if 'invalid input' in raw_mac_table.lower():
-            
-            #try different syntax for mac address table
-            raw_mac_table = net_connect.send_command('show mac address-table')
-        
-        for bgp_neighbor_ip, bgp_neighbor_info in bgp_neighbor_dict.items():
-        
-            #initiate mac_arp_compare function to retrieve
-            host_dict = mac_arp_compare(raw_mac_table = raw_mac_table,
-                                             raw_arp_table = raw_arp_table,
-                                             host = bgp_neighbor_ip
-                                            )
-            
-            # write retrieved information to csv file
-            bgp_neighbor_csv_writer.writerow([device, bgp_neighbor_ip, host_dict['interface'],
-                                              bgp_neighbor_info['router_id'],
-                                              bgp_neighbor_info['bgp_state'],
-                                              bgp_neighbor_info['bgp_prefixes_received'],
-                                              bgp_neighbor_info['bgp_neighbor_as'],
-                                              bgp_neighbor_info['neighbor_uptime'], 
-                                              bgp_neighbor_info['description']
-                                             ])
-                
-        # message to user to show bgp neighbor information is done being collected
-        usr_msg = "Done!"
-        print(colorama.Fore.CYAN + usr_msg)
-                
-        # disconnect from the device            
-        net_connect.disconnect()
+            try:
+                device_result = future.result()
+
+            # in case of authentication failure
+            # user will be informed and the sweep continues with the next device
+            except netmiko.ssh_exception.NetMikoAuthenticationException:
+                failed_devices.append(device)
+
+                usr_msg = device.upper() + " Authentication Failure"
+                print(colorama.Fore.RED + usr_msg)
+
+                continue
+
+            # in case of device type value error
+            # user will be informed and the sweep continues with the next device
+            except ValueError:
+                failed_devices.append(device)
+
+                usr_msg = device.upper() + " Device Type Failure. Device Type " + device_type
+                usr_msg += " Does Not Exist"
+                print(colorama.Fore.RED + usr_msg)
+
+                continue
+
+            # in case of a timeout or any other failure of this device
+            # user will be informed and the sweep continues with the next device
+            except Exception as error:
+                failed_devices.append(device)
+
+                usr_msg = device.upper() + " Failed - " + str(error)
+                print(colorama.Fore.RED + usr_msg)
+
+                continue
+
+            # add the device to the session graph
+            router_id = device_result['router_id']
+            bgp_session_graph.add_device(device, router_id, device_result['local_as'])
+
+            for bgp_neighbor_ip, bgp_neighbor in device_result['bgp_neighbor_dict'].items():
+                host_dict = device_result['host_dicts'][bgp_neighbor_ip]
+
+                # write retrieved information to csv file
+                bgp_neighbor_csv_writer.writerow([device, bgp_neighbor_ip, host_dict['interface'],
+                                                  bgp_neighbor.router_id,
+                                                  bgp_neighbor.bgp_state,
+                                                  bgp_neighbor.bgp_prefixes_received,
+                                                  bgp_neighbor.bgp_neighbor_as,
+                                                  bgp_neighbor.uptime(),
+                                                  bgp_neighbor.description
+                                                 ])
+
+                # add this side of the session to the session graph
+                bgp_session_graph.add_session(router_id, bgp_neighbor)
+
+                # fold the prefix count into the baseline of the neighbor
+                prefix_anomaly = prefix_baselines.update(device, bgp_neighbor_ip,
+                                                         bgp_neighbor.bgp_prefixes_received)
+                if prefix_anomaly:
+                    prefix_anomalies.append(prefix_anomaly)
+
+            # make sure the rows of this device reach the disk
+            bgp_neighbor_csv.flush()
+
+            # message to user to show bgp neighbor information is done being collected
+            usr_msg = device.upper() + " Done!"
+            print(colorama.Fore.CYAN + usr_msg)
+
+    # the log file and the state of the collected devices are kept
+    # even if the sweep itself is interrupted
+    finally:
+        # release the worker pool
+        executor.shutdown(wait=True, cancel_futures=True)
+
+        # close csv log file
+        bgp_neighbor_csv.close()
+
+        # store the prefix baselines for the next run
+        prefix_baselines.save()
+
+        # store the resolved interfaces for the next run
+        bgp_neighbor_cache.save()
+
+    # display the devices that are missing from the log file
+    if failed_devices:
+        usr_msg = "\nNot collected: " + ", ".join(device.upper() for device in failed_devices)
+        print(colorama.Fore.RED + usr_msg)
+
+    # compare both ends of every session across the fleet
+    # sessions towards a device that was not collected show up as one-sided
+    usr_msg = "\nChecking BGP Session Consistency...."
+    print(colorama.Fore.MAGENTA + usr_msg)
+
+    # display every one-sided or mismatched session to the user
+    for issue in bgp_session_graph.check_consistency():
+        usr_msg = issue['device'] + ' -> ' + issue['bgp_neighbor']
+        usr_msg += ' (' + issue['router_id'] + '): ' + issue['issue']
+        print(colorama.Fore.RED + usr_msg)
+
+    # display every neighbor whose prefix count deviates sharply from its baseline
+    for prefix_anomaly in prefix_anomalies:
+        usr_msg = prefix_anomaly['device'] + ' -> ' + prefix_anomaly['bgp_neighbor']
+        usr_msg += ': received ' + str(prefix_anomaly['prefixes']) + ' prefixes'
+        usr_msg += ', baseline is ' + str(prefix_anomaly['baseline'])
+        print(colorama.Fore.RED + usr_msg)
+
+    # answer reachability and as path queries from the user
+    _query_bgp_session_graph(bgp_session_graph)
         
     # message to the user about the mac arp parse ending
     usr_msg = "\nThe BGP Neighbor Advanced script has completed running!\n"
@@ -19,6 +19,9 @@ import csv
 #import ipaddress for network calculations
 import ipaddress
 
+# import sys to intern the strings repeated across bgp neighbors
+import sys
+
 # initiate colorama which is required for windows
 # autoreset also allows to clear colorama settings per print statement
 colorama.init(autoreset=True)
@@ -113,125 +116,193 @@ def _read_file(filename):
     # return user items
     return user_items
         
+class BGPNeighbor:
+    """ bgp neighbor
+    compact record of a single bgp neighbor
+
+    __slots__ removes the per record dictionary and the strings that repeat
+    across neighbors (state, as, router id, description) are interned so a
+    whole fleet's neighbor tables share one copy of each """
+
+    __slots__ = ('bgp_neighbor', 'bgp_state', 'bgp_prefixes_received', 'description',
+                 'bgp_neighbor_as', 'router_id', 'neighbor_uptime')
+
+    def __init__(self, bgp_neighbor):
+        # neighbor ip address
+        self.bgp_neighbor = bgp_neighbor
+
+        # bgp state, i.e. Established or Active
+        self.bgp_state = ''
+
+        # int of prefixes received, None if the neighbor did not report any
+        self.bgp_prefixes_received = None
+
+        # description will not show up in show ip bgp neighbor unless it is set
+        self.description = 'N/A'
+
+        # remote as number
+        self.bgp_neighbor_as = ''
+
+        # remote router id
+        self.router_id = ''
+
+        # int of seconds the session has been up for
+        self.neighbor_uptime = 0
+
+    def uptime(self):
+        """ uptime
+        formats the session uptime the same way cisco does
+
+        example: 01:28:36, 1d02h, 2w3d """
+
+        # split the uptime into its components
+        minutes, seconds = divmod(self.neighbor_uptime, 60)
+        hours, minutes = divmod(minutes, 60)
+        days, hours = divmod(hours, 24)
+        weeks, days = divmod(days, 7)
+
+        if weeks:
+            return '%dw%dd' % (weeks, days)
+        elif days:
+            return '%dd%02dh' % (days, hours)
+
+        return '%02d:%02d:%02d' % (hours, minutes, seconds)
+
+# seconds in each unit of a cisco uptime such as 1d02h or 2w3d
+UPTIME_UNITS = {'y': 31536000, 'w': 604800, 'd': 86400, 'h': 3600, 'm': 60, 's': 1}
+
+def _parse_uptime(raw_uptime):
+    """ _parse_uptime
+    converts a cisco uptime into seconds
+
+    example: 01:28:36 -> 5316, 1d02h -> 93600, never -> 0 """
+
+    # initialize the uptime
+    uptime = 0
+
+    # example: 01:28:36
+    if raw_uptime.count(':') == 2:
+        hours, minutes, seconds = raw_uptime.split(':')
+        if (hours + minutes + seconds).isdecimal():
+            uptime = int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+        return uptime
+
+    # example: 1d02h or 2w3d
+    number = ''
+    for character in raw_uptime:
+        if character.isdecimal():
+            number += character
+        elif number and character in UPTIME_UNITS:
+            uptime += int(number) * UPTIME_UNITS[character]
+            number = ''
+
+    return uptime
+
 def _parse_bgp_neighbor(raw_bgp_neighbor):
     """ _parse_bgp_neighbor
-    parses the show ip bgp neighbor output and writes to the command prompt
-    
+    parses the show ip bgp neighbor output into bgp neighbor records
+
+    returns
+    -------
+    bgp_neighbor_dict
+        dict representing the parsed data of show ip bgp neighbor
+        will contain the neighbor ip as key and a BGPNeighbor record as value
+
     example:
     Neighbor 172.31.6.2 in state Established, has 3 routes has description  Router 3
     in New York, is in AS 65500, has a router ID of 10.2.0.1, and has been up for 0
     6:01:43
     """
-    
-    # initalize dictionary that will contain the bgp routing table information
+
+    # initalize dictionary that will contain the bgp neighbor information
     # of each device
-    bgp_neighbor_parse_dict = {}
-    
-    # description will not show up in show ip bgp neighbor unless it is set
-    # so initialize variable so that it can be referenced in the event there
-    # is no description
-    description = ''
-    bgp_neighbor_ip = ''
-    
+    bgp_neighbor_dict = {}
+
+    # initialize the record of the neighbor currently being parsed
+    bgp_neighbor = None
+
     # iterate over each line and check for interesting data
     for line in raw_bgp_neighbor.splitlines():
-    
-        # check if bgp_neighbor_ip has already been defined
-        if bgp_neighbor_ip and 'bgp neighbor' in line.lower():
-        
-            # display information to user about bgp neighbors if there are more than one bgp neighbors
-            display_msg = '\nNeighbor ' + bgp_neighbor_ip + ' in state ' + bgp_state
-            display_msg += ', has ' + bgp_prefixes_received + ' routes'
-            if description:
-                display_msg += ', has description' + description + 'N/A'
-            display_msg += ', is in AS ' + bgp_neighbor_as
-            display_msg += ' has a router ID of ' + router_id
-            display_msg += ', and has been up for ' + neighbor_uptime + '\n'
-            
-            # print output to command line
-            print(colorama.Fore.CYAN + display_msg)
-            
-            # Reset description parameter, as if this is user not set, the output
-            # for description will not be shown
-            description = ''
-        
+
         # strip white space
         line = line.strip()
-        
+        lowered_line = line.lower()
+
+        # example line: BGP neighbor is 172.31.6.2,  remote AS 65500, external link
+        # every neighbor starts with this line so start a new record
+        if lowered_line.startswith('bgp neighbor'):
+            # split based on white space
+            parameters = line.replace(',', '').split()
+            bgp_neighbor = None
+
+            # iterate over each parameter
+            for parameter in parameters:
+                if parameter.count('.') == 3 and bgp_neighbor is None:
+                    bgp_neighbor = BGPNeighbor(parameter)
+                    bgp_neighbor_dict[parameter] = bgp_neighbor
+                elif parameter.isdecimal() and bgp_neighbor is not None:
+                    bgp_neighbor.bgp_neighbor_as = sys.intern(parameter)
+                    break
+
+            continue
+
+        # skip lines until the first neighbor is found
+        if bgp_neighbor is None:
+            continue
+
         # example line: Description: Router 2 in Las Vegas
         # obtain description from output
-        if 'description' in line.lower():
-            description = line.split(':')[1]
-            continue
-        
+        if lowered_line.startswith('description'):
+            bgp_neighbor.description = sys.intern(line.split(':', 1)[1].strip())
+
         # example line: BGP state = Established, up for 01:28:36
-        # obtain bgp state from output
-        elif 'bgp state' in line.lower():
-            new_line = line.split(',')[0]
-            bgp_state = new_line.split('=')[1].strip()
-        
+        # obtain bgp state and uptime from output
+        elif 'bgp state' in lowered_line:
+            bgp_state = line.split(',')[0].split('=')[1].strip()
+            bgp_neighbor.bgp_state = sys.intern(bgp_state)
+
+            if 'up for' in lowered_line:
+                raw_uptime = line.split('up for')[-1].strip().split()[0]
+                bgp_neighbor.neighbor_uptime = _parse_uptime(raw_uptime)
+
         # example line: Prefixes Total:     3       4
         # obtain advertised prefixes inbound and outbound from output
-        elif 'prefixes total' in line.lower():
-            parameters = line.split(':')
-            parameters = parameters[1].split()
-            bgp_prefixes_sent = parameters[0]
-            bgp_prefixes_received = parameters[1]
-            continue
-        
-        # example line: For address family: IPv4 Unicast
-        # get address family from output
-        elif 'address family' in line.lower():
-            address_family = line.split(':')[1]
-            continue
-            
-        # split based on white space
-        parameters = line.split()
-            
-        # iterate over each parameter
-        for parameter in parameters:
-           
-            # example line: BGP version 4, remote router ID 10.2.0.1
-            if 'router id' in line.lower():
-            
-                if parameter.count('.') == 3:
-                    router_id = parameter
-                else:
-                    continue
-            
-            # example line: BGP state = Established, up for 01:28:36
-                
-            elif 'bgp state' in line.lower() and parameter.count(':') >= 2:
-                neighbor_uptime = parameter.replace(',','')
-                continue
-            # example line: BGP neighbor is 172.31.6.2,  remote AS 65500, external link
-            elif 'bgp neighbor' in line.lower():
-                
+        elif 'prefixes total' in lowered_line:
+            parameters = line.split(':')[1].split()
+            if len(parameters) > 1 and parameters[1].isdecimal():
+                bgp_neighbor.bgp_prefixes_received = int(parameters[1])
+
+        # example line: BGP version 4, remote router ID 10.2.0.1
+        elif 'router id' in lowered_line:
+            for parameter in line.split():
                 if parameter.count('.') == 3:
-                    bgp_neighbor_ip = parameter.replace(',','')
-                    continue
-                    
-                elif parameter.replace(',','').isdecimal():
-                    bgp_neighbor_as = parameter
-                    continue
-    
+                    bgp_neighbor.router_id = sys.intern(parameter)
+
+    return bgp_neighbor_dict
+
+
+def _display_bgp_neighbor(bgp_neighbor):
+    """ _display_bgp_neighbor
+    writes a parsed bgp neighbor record to the command prompt """
+
     # display information to user about bgp neighbor information
-    display_msg = '\nNeighbor ' + bgp_neighbor_ip + ' in state ' + bgp_state
-    display_msg += ', has ' + bgp_prefixes_sent + ' routes'
-    
+    display_msg = '\nNeighbor ' + bgp_neighbor.bgp_neighbor + ' in state ' + bgp_neighbor.bgp_state
+
+    # check if the neighbor reported its prefixes
+    if bgp_neighbor.bgp_prefixes_received is not None:
+        display_msg += ', has ' + str(bgp_neighbor.bgp_prefixes_received) + ' routes'
+
     # check if description is defined
-    if description:
-        display_msg += ' has description ' + description
-    display_msg += ', is in AS ' + bgp_neighbor_as
-    display_msg += ' has a router ID of ' + router_id
-    display_msg += ', and has been up for ' + neighbor_uptime + '\n'
-    
+    if bgp_neighbor.description != 'N/A':
+        display_msg += ', has description ' + bgp_neighbor.description
+    display_msg += ', is in AS ' + bgp_neighbor.bgp_neighbor_as
+    display_msg += ', has a router ID of ' + bgp_neighbor.router_id
+    display_msg += ', and has been up for ' + bgp_neighbor.uptime() + '\n'
+
     # print output to command line
     print(colorama.Fore.CYAN + display_msg)
-                    
-                
-            
-            
+
 def bgp_neighbor_parse():
     """ main
     main function that is the catalyst of the script by executing all
@@ -317,6 +388,10 @@ def bgp_neighbor_parse():
         
         # parse raw output of bgp neighbor table
         parsed_bgp_table = _parse_bgp_neighbor(raw_bgp_neighbor)
+
+        # display every bgp neighbor to the user
+        for bgp_neighbor in parsed_bgp_table.values():
+            _display_bgp_neighbor(bgp_neighbor)
                 
         # message to user to show bgp neighbor information is done being collected
         usr_msg = "Done!"
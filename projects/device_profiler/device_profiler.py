@@ -13,6 +13,49 @@ import getpass
 #import csv library for command output
 import csv
 
+# import concurrent futures to profile several devices at once
+import concurrent.futures
+
+# import os and time for the session pool and the telemetry sampler
+import os
+import time
+
+# import datetime for the telemetry timestamps
+import datetime
+
+# import sys to find the inventory store of inventory parse
+import sys
+
+# import re to tokenize the show inventory output
+import re
+
+# import array for the compact telemetry buffers
+import array
+
+# import multiprocessing to borrow sessions from the session pool
+import multiprocessing
+from multiprocessing.managers import BaseManager
+
+# the inventory store, checkpoint journal and sweep trace are shared with inventory parse
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'inventory_parse'))
+from inventory_store import (InventoryStore, CheckpointJournal, SweepTrace,
+                             _display_inventory_delta, _display_sweep_summary)
+
+# a single field of show inventory, i.e. NAME: "3725 chassis" or SN: FTX0945W0MY
+# group 2 is a quoted value, which ends at a quote followed by a comma or the end
+# of the line so quotes inside a description are kept
+# group 3 is an unquoted value which ends at a comma or the end of the line
+# only spaces and tabs are skipped around the colon, so an empty SN never
+# runs on into the next line
+INVENTORY_FIELD = re.compile(r'\b(NAME|DESCR|PID|VID|SN)[ \t]*:[ \t]*'
+                             r'(?:"([^"\r\n]*(?:"[^"\r\n]*)*?)"(?=[ \t]*(?:,|\r?$))|([^,\r\n]*))',
+                             re.IGNORECASE | re.MULTILINE)
+
+# address and key file of the session pool script
+# scripts borrow their sessions from it when it is running
+SESSION_POOL_ADDRESS = ('127.0.0.1', 50505)
+SESSION_POOL_KEYFILE = os.path.join(os.path.expanduser('~'), '.networkcoder_session_pool.key')
+
 # initiate colorama which is required for windows
 # autoreset also allows to clear colorama settings per print statement
 colorama.init(autoreset=True)
@@ -107,6 +150,241 @@ def _read_file(filename):
     # return user items
     return user_items
 
+class RingBuffer:
+    """ ring buffer
+    fixed capacity buffer of (timestamp, value) samples stored in compact
+    float arrays, once full every new sample overwrites the oldest one """
+
+    __slots__ = ('timestamps', 'values', 'start', 'size')
+
+    def __init__(self, capacity):
+        # preallocate the arrays so the buffer never grows
+        self.timestamps = array.array('d', bytes(8 * capacity))
+        self.values = array.array('d', bytes(8 * capacity))
+
+        # index of the oldest sample and number of samples stored
+        self.start = 0
+        self.size = 0
+
+    def append(self, timestamp, value):
+        """ append
+        stores a sample in the buffer
+
+        returns
+        -------
+        evicted
+            tuple representing the (timestamp, value) sample that was overwritten
+            None if the buffer was not full yet
+
+        """
+
+        capacity = len(self.values)
+        evicted = None
+
+        # buffer is full so the oldest sample is overwritten
+        if self.size == capacity:
+            evicted = (self.timestamps[self.start], self.values[self.start])
+            index = self.start
+            self.start = (self.start + 1) % capacity
+        else:
+            index = (self.start + self.size) % capacity
+            self.size += 1
+
+        self.timestamps[index] = timestamp
+        self.values[index] = value
+
+        return evicted
+
+    def samples(self):
+        """ samples
+        yields the stored (timestamp, value) samples from oldest to newest """
+
+        capacity = len(self.values)
+        for offset in range(self.size):
+            index = (self.start + offset) % capacity
+            yield self.timestamps[index], self.values[index]
+
+class TelemetrySeries:
+    """ telemetry series
+    numeric time series of a single metric of a single device
+
+    recent samples are kept at full resolution, samples that age out of the
+    raw buffer are averaged in groups of downsample_factor into a second
+    buffer so older data is kept at a lower resolution """
+
+    __slots__ = ('raw', 'downsampled', 'downsample_factor',
+                 'pending_timestamp', 'pending_total', 'pending_count')
+
+    def __init__(self, raw_capacity=360, downsampled_capacity=1440, downsample_factor=10):
+        # set up the full and low resolution buffers
+        self.raw = RingBuffer(raw_capacity)
+        self.downsampled = RingBuffer(downsampled_capacity)
+        self.downsample_factor = downsample_factor
+
+        # initialize the group of aged out samples being averaged
+        self.pending_timestamp = 0.0
+        self.pending_total = 0.0
+        self.pending_count = 0
+
+    def append(self, timestamp, value):
+        """ append
+        stores a sample and downsamples whatever ages out of the raw buffer """
+
+        evicted = self.raw.append(timestamp, value)
+        if evicted is None:
+            return
+
+        # the group is timestamped with its first sample
+        if not self.pending_count:
+            self.pending_timestamp = evicted[0]
+        self.pending_total += evicted[1]
+        self.pending_count += 1
+
+        # store the average of the group once it is complete
+        if self.pending_count == self.downsample_factor:
+            self.downsampled.append(self.pending_timestamp, self.pending_total / self.pending_count)
+            self.pending_total = 0.0
+            self.pending_count = 0
+
+def _flatten_environment(get_environment):
+    """ flatten environment
+    flattens a napalm get_environment result into typed rows
+    every value is converted to a float and booleans become 1.0 or 0.0
+
+    returns
+    -------
+    rows
+        list representing one row per cpu, memory field, sensor, fan and power supply
+        each entry is a tuple of component, name, metric and float value
+
+        example format listed below:
+
+        [ ('cpu', '0', '%usage', 1.0), ('memory', 'ram', 'used_ram', 23811400.0),
+          ('temperature', 'invalid', 'temperature', -1.0),
+          ('temperature', 'invalid', 'is_alert', 0.0) ]
+
+    """
+
+    # initialize rows
+    rows = []
+
+    # example: {0: {'%usage': 1.0}}
+    for cpu, cpu_values in get_environment.get('cpu', {}).items():
+        rows.append(('cpu', str(cpu), '%usage', float(cpu_values['%usage'])))
+
+    # example: {'used_ram': 23811400, 'available_ram': 186595136}
+    for memory_field, memory_value in get_environment.get('memory', {}).items():
+        rows.append(('memory', 'ram', memory_field, float(memory_value)))
+
+    # example: {'invalid': {'is_alert': False, 'is_critical': False, 'temperature': -1.0}}
+    # example: {'Fan 1': {'status': True}}
+    # example: {'PSU 1': {'status': True, 'capacity': 750.0, 'output': 120.0}}
+    for component in ('temperature', 'fans', 'power'):
+        for name, values in get_environment.get(component, {}).items():
+            for metric, value in values.items():
+                # skip values that are not numbers such as empty strings
+                if isinstance(value, (bool, int, float)):
+                    rows.append((component, str(name), metric, float(value)))
+
+    return rows
+
+def _environment_metrics(get_environment):
+    """ environment metrics
+    picks the cpu, memory and temperature readings out of a napalm
+    get_environment result for the telemetry sampler
+
+    returns
+    -------
+    metrics
+        list representing every reading of the environment
+        each entry is a tuple of metric name and float value
+
+        example format listed below:
+
+        [ ('cpu 0 %usage', 1.0), ('memory ram used_ram', 23811400.0),
+          ('temperature invalid temperature', -1.0) ]
+
+    """
+
+    # initialize metrics
+    metrics = []
+
+    # iterate through the flattened environment
+    for component, name, metric, value in _flatten_environment(get_environment):
+        # alert flags are not worth trending
+        if component in ('cpu', 'memory', 'temperature') and not metric.startswith('is_'):
+            metrics.append((component + ' ' + name + ' ' + metric, value))
+
+    return metrics
+
+class SessionPoolManager(BaseManager):
+    """ session pool manager
+    client side of the session pool script """
+
+# the session pool only serves the session pool object
+SessionPoolManager.register('session_pool')
+
+def _connect_session_pool():
+    """ connect session pool
+    connects to the session pool script if it is running
+
+    returns
+    -------
+    session_pool
+        proxy of the session pool or None if the session pool is not running
+
+    """
+
+    try:
+        # read the key written by the session pool
+        with open(SESSION_POOL_KEYFILE, 'rb') as keyfile:
+            authkey = keyfile.read().strip()
+
+        # connect to the session pool
+        manager = SessionPoolManager(address=SESSION_POOL_ADDRESS, authkey=authkey)
+        manager.connect()
+
+        return manager.session_pool()
+
+    # fall back to direct connections if the session pool is not running
+    except (OSError, EOFError, multiprocessing.AuthenticationError):
+        return None
+
+class BorrowedSession:
+    """ borrowed session
+    stands in for a napalm driver and runs every getter over the session
+    held by the session pool, closing it only hands the session back """
+
+    def __init__(self, session_pool, device, device_type, username, password, secret):
+        # session pool proxy
+        self.session_pool = session_pool
+
+        # arguments the session pool needs to find or open the session
+        self.session_args = (device, device_type, username, password, secret)
+
+        # oldest getter result in seconds the script accepts from the getter cache
+        # none accepts the max age of the session pool and 0 always asks the device
+        self.max_age = None
+
+    def open(self):
+        """ open
+        makes sure the session pool has an open session to the device """
+
+        self.session_pool.open(*self.session_args)
+
+    def close(self):
+        """ close
+        the session stays open in the session pool """
+
+    def __getattr__(self, getter):
+        """ getter
+        runs the napalm getter or method in the session pool """
+
+        def call(*args, **kwargs):
+            return self.session_pool.call(*self.session_args, getter, args, kwargs, self.max_age)
+
+        return call
+
 class DeviceProfiler:
     """ device profiler
     logs into specified switches and collects a large variety of information and
@@ -133,6 +411,37 @@ class DeviceProfiler:
         
         # get log filename for device profiler output
         self.device_filename = input('\nPlease provide a device profile output filename: ').strip()
+
+        # get trace filename
+        self.trace_filename = input('\nPlease provide a trace filename (leave blank to skip): ').strip()
+
+        # get the number of devices to profile at the same time
+        max_workers = input('\nPlease provide the number of concurrent sessions (default 8): ').strip()
+
+        # fall back to the default worker budget
+        if not max_workers.isdecimal() or not int(max_workers):
+            max_workers = '8'
+
+        self.max_workers = int(max_workers)
+
+        # load the results of previous sweeps that were interrupted
+        self.journal = CheckpointJournal('device_profiler.journal')
+
+        # time every phase of every device
+        self.sweep_trace = SweepTrace()
+
+        # set up telemetry datastructure
+        # (device, metric) -> TelemetrySeries
+        self.telemetry = {}
+
+        # open the inventory store to track hardware changes between runs
+        self.inventory_store = InventoryStore('inventory.db')
+
+        # borrow sessions from the session pool if it is running
+        self.session_pool = _connect_session_pool()
+        if self.session_pool is not None:
+            usr_msg = "\nBorrowing sessions from the session pool."
+            print(colorama.Fore.CYAN + usr_msg)
         
     def _check_user_provided_data_for_errors(self):
         """ check user provided data for errors
@@ -162,14 +471,105 @@ class DeviceProfiler:
 
         return valid_data
         
+    def _open_session(self, device, device_type):
+        """ open session
+        opens a napalm session to the device
+
+        returns
+        -------
+        net_connect
+            the open napalm driver of the device
+
+        """
+
+        # provide context for user
+        usr_msg = "\nConnecting to " + device.upper()
+        print(colorama.Fore.MAGENTA + usr_msg)
+
+        # borrow the session from the session pool if it is running
+        if self.session_pool is not None:
+            net_connect = BorrowedSession(self.session_pool, device, device_type,
+                                          self.username, self.password, self.secret)
+
+        else:
+            # initialize the driver for napalm
+            driver = napalm.get_network_driver(device_type)
+
+            # setup driver profile
+            net_connect = driver(
+                hostname=device,
+                username=self.username,
+                password=self.password,
+                optional_args={'secret': self.secret},
+            )
+
+        # open connection
+        net_connect.open()
+
+        return net_connect
+
+    def _profile_device(self, device, device_type):
+        """ profile device
+        opens a single session to the device and runs every getter over it
+        this runs inside a worker thread so several devices are profiled at once
+
+        returns
+        -------
+        device_profile
+            tuple representing the get_environment, get_facts and parsed inventory
+            results of the device
+
+        """
+
+        # open connection
+        # napalm connects, authenticates and enters enable mode in one go
+        with self.sweep_trace.phase(device, 'connect'):
+            net_connect = self._open_session(device, device_type)
+
+        try:
+            # message to user to show inventory information is being collected
+            usr_msg = "Collecting Inventory from " + device.upper() + "...."
+            print(colorama.Fore.CYAN + usr_msg)
+
+            # initialize get_environment and get_facts functions to retrieve
+            # switch information about its environment and resources
+            with self.sweep_trace.phase(device, 'get_environment'):
+                get_environment = net_connect.get_environment()
+            with self.sweep_trace.phase(device, 'get_facts'):
+                get_facts = net_connect.get_facts()
+
+            # collect unformatted inventory information
+            command = ['show inventory']
+            with self.sweep_trace.phase(device, 'command', 'show inventory') as event:
+                inventory_raw = net_connect.cli(command)
+                event['bytes'] = len(inventory_raw['show inventory'].encode())
+
+        # disconnect from the device even if a getter failed
+        finally:
+            with self.sweep_trace.phase(device, 'disconnect'):
+                net_connect.close()
+
+        # parse the inventory once the session has been released
+        with self.sweep_trace.phase(device, 'parse'):
+            parsed_inventory = self._parse_inventory(inventory_raw['show inventory'])
+
+        return get_environment, get_facts, parsed_inventory
+
     def _run_commands(self):
         """ run commands
-        runs the napalm getters to get the neighborship information of switches """
+        runs the napalm getters to get the neighborship information of switches
+        devices are profiled concurrently by a pool of worker threads """
 
         # stop deploy if the data the user provided is not valid
         if not self._check_user_provided_data_for_errors():
             return
 
+        # initialize the worker pool with a fixed worker budget
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+
+        # initialize the pending device profiles
+        futures = {}
+
         # iterate through the devices
         for device in self.devices:
             # initialize device type
@@ -181,58 +581,94 @@ class DeviceProfiler:
                 # re-initialize device and device type
                 device_type = device.split(',')[-1].strip().lower()
                 device = device.split(',')[0].strip()
-            
-            # initialize the driver for napalm
-            driver = napalm.get_network_driver(device_type)
-            
-            # provide context for user
-            usr_msg = "\nConnecting to " + device.upper()
-            print(colorama.Fore.MAGENTA + usr_msg)
 
-            # initialize the connection handler for napalm
-            try:
-                # setup driver profile
-                net_connect = driver(
-                    hostname=device,
-                    username=self.username,
-                    password=self.password,
-                    optional_args={'secret': self.secret},
-                )
-
-                # open connection
-                net_connect.open()
-                
+            # reuse the journaled profile if the device was profiled recently
+            journaled_profile = self.journal.fresh(device)
+            if journaled_profile is not None:
+                self.get_environment[device] = journaled_profile['get_environment']
+                self.get_facts[device] = journaled_profile['get_facts']
+                self.parsed_inventory[device] = journaled_profile['parsed_inventory']
+
+                usr_msg = "\nSkipping " + device.upper() + " - already profiled"
+                print(colorama.Fore.CYAN + usr_msg)
+                continue
+
+            # hand the device over to the worker pool
+            future = executor.submit(self._profile_device, device, device_type)
+            futures[future] = device
+
+        # initialize the devices that could not be profiled
+        failed_devices = []
+
+        # set once the switches refuse the credentials
+        authentication_failed = False
+
+        # merge each device profile as soon as it completes
+        # only this thread writes to the profile datastructures
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                device = futures[future]
+
+                # device was cancelled after an authentication failure
+                if future.cancelled():
+                    failed_devices.append(device)
+                    continue
+
+                try:
+                    get_environment, get_facts, parsed_inventory = future.result()
+
+                # in case of authentication failure
+                # the devices that have not started yet are cancelled, devices
+                # already in progress are still merged and journaled
+                except napalm.base.exceptions.ConnectionException:
+                    failed_devices.append(device)
+
+                    if not authentication_failed:
+                        authentication_failed = True
+
+                        usr_msg = "\nAuthentication Failure - Cancelling Remaining Devices.\n"
+                        print(colorama.Fore.RED + usr_msg)
+
+                        for pending_future in futures:
+                            pending_future.cancel()
+
+                    continue
+
+                # any other failure only affects this device
+                except Exception as error:
+                    failed_devices.append(device)
+
+                    usr_msg = device.upper() + " Failed - " + str(error)
+                    print(colorama.Fore.RED + usr_msg)
+
+                    continue
+
+                self.get_environment[device] = get_environment
+                self.get_facts[device] = get_facts
+                self.parsed_inventory[device] = parsed_inventory
+
+                # journal the profile so a re-run can skip this device
+                self.journal.record(device, {'get_environment': get_environment,
+                                             'get_facts': get_facts,
+                                             'parsed_inventory': parsed_inventory})
+
                 # message to user to show inventory information is being collected
-                usr_msg = "Collecting Inventory...."
+                usr_msg = device.upper() + " Done!"
                 print(colorama.Fore.CYAN + usr_msg)
-                
-                # initialize get_environment and get_facts functions to retrieve
-                # switch information about its environment and resources
-                self.get_environment[device] = net_connect.get_environment()
-                self.get_facts[device] = net_connect.get_facts()
-                
-                # collect unformatted inventory information
-                command = ['show inventory']
-                inventory_raw = net_connect.cli(command)
-                self.parsed_inventory[device] = self._parse_inventory(inventory_raw['show inventory'])
-                
-                    
-            # in case of authentication failure
-            # user will be informed and the program will exit
-            except napalm.base.exceptions.ConnectionException:
 
-                usr_msg = "\nAuthentication Failure - Exiting Device Profiler.\n"
-                print(colorama.Fore.RED + usr_msg)
+        # release the worker pool even if merging a profile failed
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        # list the devices a re-run still has to profile
+        if failed_devices:
+            usr_msg = "\nNot profiled: " + ", ".join(device.upper() for device in failed_devices)
+            print(colorama.Fore.RED + usr_msg)
+
+        # persist any hardware change since the last run
+        for device, parsed_inventory in self.parsed_inventory.items():
+            _display_inventory_delta(device, self.inventory_store.update(device, parsed_inventory))
 
-                # exit program
-                return
-            
-            # message to user to show inventory information is being collected
-            usr_msg = "Done!"
-            print(colorama.Fore.CYAN + usr_msg)
-            # disconnect from the device
-            net_connect.close()
-    
     def device_profiler(self):
         """ device_profiler
         main function that is the catalyst of the script by executing all
@@ -287,8 +723,8 @@ class DeviceProfiler:
         device_profiler_csv_writer.writerow(['Device', 'Vendor', 
                                              'Model', 'OS Version',
                                              'Serial Number', 'Uptime (s)',
-                                             'Temperature', 'Used RAM (b)',
-                                             'Available RAM (b)', 'CPU'
+                                             'Max Temperature (C)', 'Used RAM (b)',
+                                             'Available RAM (b)', 'Average CPU (%)'
                                             ])
         
         # iterate over dictionary that stores get environment information
@@ -302,11 +738,18 @@ class DeviceProfiler:
             model = self.get_facts[device]['model']
             
             # store values in readable names for output from get_environment output from napalm
-            cpu = get_environment_parameters['cpu']
-            temperature = get_environment_parameters['temperature']
             used_ram = get_environment_parameters['memory']['used_ram']
             available_ram = get_environment_parameters['memory']['available_ram']
-            power = get_environment_parameters['power']
+
+            # summarize multiple cpu cores and sensors into a single number
+            # every core and sensor is written to the environment csv file
+            cpu_usages = [float(cpu_values['%usage'])
+                          for cpu_values in get_environment_parameters['cpu'].values()]
+            temperatures = [float(sensor_values['temperature'])
+                            for sensor_values in get_environment_parameters['temperature'].values()]
+
+            cpu = round(sum(cpu_usages) / len(cpu_usages), 2) if cpu_usages else ''
+            temperature = max(temperatures) if temperatures else ''
             
             # write device profile information to csv file
             device_profiler_csv_writer.writerow([device, vendor, 
@@ -315,10 +758,230 @@ class DeviceProfiler:
                                      temperature, used_ram,
                                      available_ram, cpu
                                     ])
+
+        # close csv log file
+        device_profiler_csv.close()
+
+        # write every cpu core, memory field, sensor, fan and power supply
+        # as its own typed row to the environment csv file
+        environment_filename = self.device_filename[:-len('.csv')] + '_environment.csv'
+        with open(environment_filename, 'w', newline='') as environment_csv:
+            # initialize csv writer
+            environment_csv_writer = csv.writer(environment_csv)
+
+            # write header for csv file
+            environment_csv_writer.writerow(['Device', 'Component', 'Name', 'Metric', 'Value'])
+
+            # iterate over dictionary that stores get environment information
+            for device, get_environment_parameters in self.get_environment.items():
+                environment_rows = [(device,) + row for row in _flatten_environment(get_environment_parameters)]
+
+                # the uptime fact is numeric as well
+                environment_rows.append((device, 'facts', 'system', 'uptime',
+                                         float(self.get_facts[device]['uptime'])))
+
+                # write the rows of the device in one batch
+                environment_csv_writer.writerows(environment_rows)
+
+        # close the inventory store
+        self.inventory_store.close()
+
+        # display where the time of the sweep went
+        _display_sweep_summary(self.sweep_trace)
+
+        # write the trace of the sweep
+        if self.trace_filename:
+            self.sweep_trace.save(self.trace_filename)
                                     
+    def _close_session(self, net_connect):
+        """ close session
+        closes a napalm session, a session that has already dropped
+        cannot be closed cleanly so the error is ignored """
+
+        try:
+            net_connect.close()
+        except Exception:
+            pass
+
+    def sample_environment(self, interval, number_of_samples):
+        """ sample environment
+        polls get_environment of every device on an interval
+        the sessions stay open for the whole sampling period and every round
+        polls the devices concurrently
+        a device that drops out misses its rounds until its session is reopened
+        the sampling can be stopped early with ctrl+c, the samples collected
+        so far are kept in the telemetry """
+
+        # stop sampling if the data the user provided is not valid
+        if not self._check_user_provided_data_for_errors():
+            return
+
+        # initialize the worker pool with a fixed worker budget
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+
+        # initialize the device type of every device
+        device_types = {}
+        for device in self.devices:
+            # initialize device type
+            # by default set to cisco ios to play it safe
+            device_type = 'ios'
+
+            # if the user has provided the device type
+            if ',' in device:
+                # re-initialize device and device type
+                device_type = device.split(',')[-1].strip().lower()
+                device = device.split(',')[0].strip()
+
+            device_types[device] = device_type
+
+        # set up sessions datastructure
+        # a device without a session is reopened at the start of the next round
+        sessions = {}
+
+        # set up the number of rounds every device has missed
+        missed_rounds = {}
+
+        try:
+            # open a persistent session to every device
+            futures = {}
+            for device, device_type in device_types.items():
+                futures[executor.submit(self._open_session, device, device_type)] = device
+
+            for future in concurrent.futures.as_completed(futures):
+                device = futures[future]
+
+                try:
+                    sessions[device] = future.result()
+                    missed_rounds[device] = 0
+
+                    # every sample has to come from the device and not from the getter cache
+                    if isinstance(sessions[device], BorrowedSession):
+                        sessions[device].max_age = 0
+
+                # devices that cannot be reached are left out of the sampling
+                except Exception:
+                    usr_msg = "\nConnection Failure - Skipping " + device.upper()
+                    print(colorama.Fore.RED + usr_msg)
+
+            # iterate through the sampling rounds
+            for sample in range(number_of_samples):
+                round_start = time.time()
+
+                # message to user to show the sampling progress
+                usr_msg = "Sampling Environment " + str(sample + 1) + "/" + str(number_of_samples) + "...."
+                print(colorama.Fore.CYAN + usr_msg)
+
+                # reopen the sessions that dropped in an earlier round
+                futures = {}
+                for device, net_connect in sessions.items():
+                    if net_connect is None:
+                        futures[executor.submit(self._open_session, device, device_types[device])] = device
+
+                for future in concurrent.futures.as_completed(futures):
+                    device = futures[future]
+
+                    try:
+                        sessions[device] = future.result()
+                        if isinstance(sessions[device], BorrowedSession):
+                            sessions[device].max_age = 0
+
+                    # the device is tried again in the next round
+                    except Exception:
+                        pass
+
+                # poll every device at the same time
+                futures = {}
+                for device, net_connect in sessions.items():
+                    if net_connect is not None:
+                        futures[executor.submit(net_connect.get_environment)] = device
+
+                # store the numeric values of each device as it completes
+                for future in concurrent.futures.as_completed(futures):
+                    device = futures[future]
+
+                    try:
+                        get_environment = future.result()
+
+                    # a dropped session raises napalm, netmiko or socket errors
+                    # the device misses this round and its session is reopened
+                    except Exception as error:
+                        usr_msg = "Connection Failure - Missed Sample From " + device.upper()
+                        usr_msg += " (" + type(error).__name__ + ")"
+                        print(colorama.Fore.RED + usr_msg)
+
+                        self._close_session(sessions[device])
+                        sessions[device] = None
+                        continue
+
+                    for metric, value in _environment_metrics(get_environment):
+                        if (device, metric) not in self.telemetry:
+                            self.telemetry[(device, metric)] = TelemetrySeries()
+                        self.telemetry[(device, metric)].append(round_start, value)
+
+                # count the round as missed for devices without a sample
+                for device, net_connect in sessions.items():
+                    if net_connect is None:
+                        missed_rounds[device] += 1
+
+                # wait for the rest of the interval before the next round
+                if sample + 1 < number_of_samples:
+                    time.sleep(max(0, interval - (time.time() - round_start)))
+
+        # stop sampling early, the samples so far are still saved
+        except KeyboardInterrupt:
+            usr_msg = "\nSampling stopped - keeping the samples collected so far."
+            print(colorama.Fore.MAGENTA + usr_msg)
+
+        finally:
+            # disconnect from the devices
+            for net_connect in sessions.values():
+                if net_connect is not None:
+                    self._close_session(net_connect)
+
+            # release the worker pool
+            executor.shutdown(wait=True)
+
+        # inform the user of the devices that missed rounds
+        for device, missed in sorted(missed_rounds.items()):
+            if missed:
+                usr_msg = device.upper() + " missed " + str(missed) + " of the sampling rounds"
+                print(colorama.Fore.RED + usr_msg)
+
+    def save_telemetry(self, telemetry_filename):
+        """ save telemetry
+        writes every telemetry series to a csv file
+        downsampled samples come before the full resolution samples of a series """
+
+        # check if log file name ends with csv
+        if not telemetry_filename.endswith('.csv'):
+            telemetry_filename = telemetry_filename + '.csv'
+
+        # open csv log file
+        with open(telemetry_filename, 'w', newline='') as telemetry_csv:
+            # initialize csv writer
+            telemetry_csv_writer = csv.writer(telemetry_csv)
+
+            # write header for csv file
+            telemetry_csv_writer.writerow(['Device', 'Metric', 'Resolution', 'Timestamp', 'Value'])
+
+            # iterate through the telemetry series
+            for (device, metric), telemetry_series in sorted(self.telemetry.items()):
+                resolution = str(telemetry_series.downsample_factor) + 'x'
+                for timestamp, value in telemetry_series.downsampled.samples():
+                    telemetry_csv_writer.writerow([device, metric, resolution,
+                                                   datetime.datetime.fromtimestamp(timestamp).isoformat(timespec='seconds'),
+                                                   value])
+
+                for timestamp, value in telemetry_series.raw.samples():
+                    telemetry_csv_writer.writerow([device, metric, 'raw',
+                                                   datetime.datetime.fromtimestamp(timestamp).isoformat(timespec='seconds'),
+                                                   value])
+
     def _parse_inventory(self, inventory_raw):
         """ _parse_inventory
         parses the inventory output into a sorted dictionary
+        fields are tokenized in a single pass and anything that does not look
+        like a field is skipped, so unexpected output never aborts the device
         
         returns
         --------------
@@ -335,59 +998,38 @@ class DeviceProfiler:
         ## Example raw format from show inventory
         # NAME: "3725 chassis", DESCR: "3725 chassis"
         # PID:                   , VID: 0.1, SN: FTX0945W0MY
-        
+
         # initialize dictionaries
         inventory_dict_single = {}
         inventory_dict_all = {}
 
-        # iterate over each line from show inventory output
-        for line in inventory_raw.splitlines():
-        
-            # strip white trailing white space
-            line = line.strip()
-                
-            # remove quotations in the description of devices
-            inventory_segments = line.replace('"','')
-            
-            # split on comma, which separates the different inventory parameters
-            inventory_segments = inventory_segments.split(',')
-                    
-            # If line is blank, continue as it doesn't contain any interesting info
-            if line == '':
-                continue
-                
-            # iterate over each inventory parameter and separate the field name and value
-            for inventory_segment in inventory_segments:
-                
-                # Format of inventory output is always Field name: Field value
-                field_name, field_value = inventory_segment.split(':')
-                
-                # make field_name lower case and remove trailing white space
-                field_name = field_name.strip()
-                field_name = field_name.lower()
-                
-                # remove trailing white space from field_value
-                field_value = field_value.strip()
-                
-                # if this is a new part, create a new dictionary
-                if line.lower().startswith('name'):
-                    
-                    # store the dictionary key for this inventory part
-                    inventory_name = field_value
-                
-                # store part parameters into a dictionary
-                inventory_dict_single[field_name] = field_value
-            
-            # flag to know when last piece of information for this part is complete
-            if line.lower().startswith('pid'):
-            
+        # walk every field of the output in a single pass
+        # quoted values are consumed whole so colons and commas inside them
+        # are never mistaken for the start of another field
+        for field_name, quoted_value, field_value in INVENTORY_FIELD.findall(inventory_raw):
+
+            # make field_name lower case
+            field_name = field_name.lower()
+
+            # quoted values are in the second group and everything else is in the third
+            if quoted_value:
+                field_value = quoted_value
+            else:
+                field_value = field_value.strip().strip('"')
+
+            # every part starts with its name so this is a new part
+            if field_name == 'name':
+                inventory_dict_single = {'name': field_value, 'descr': '', 'pid': '', 'vid': '', 'sn': ''}
+
                 # store dictionary of one inventory part into a larger dictionary
-                inventory_dict_all[inventory_name] = inventory_dict_single
-                
-                # reset dictionary
-                inventory_dict_single = {}
+                inventory_dict_all[field_value] = inventory_dict_single
 
-        return inventory_dict_all      
+            # store part parameters into the dictionary of the current part
+            # fields found before the first name are ignored
+            elif inventory_dict_single:
+                inventory_dict_single[field_name] = field_value
+
+        return inventory_dict_all
  
 def main():
     # message to the user about the quick deploy script
@@ -402,6 +1044,29 @@ def main():
     # run the commands via the napalm interface
     device_profiler.device_profiler()
 
+    # ask the user whether the environment should be sampled over time
+    interval = input('\nPlease provide a telemetry sampling interval in seconds (leave blank to skip): ').strip()
+
+    if interval.isdecimal() and int(interval):
+        # ask the user for the length of the sampling period
+        number_of_samples = input('Please provide the number of samples to collect: ').strip()
+
+        # fall back to a single hour of samples
+        if not number_of_samples.isdecimal() or not int(number_of_samples):
+            number_of_samples = str(3600 // int(interval) or 1)
+
+        # ask for the output file first as the sampling can run for hours
+        telemetry_filename = input('Please provide a telemetry output filename: ').strip()
+
+        # sample the environment of the devices
+        # the samples collected so far are written even if the sampling fails
+        try:
+            device_profiler.sample_environment(int(interval), int(number_of_samples))
+
+        # write the telemetry to its own csv file
+        finally:
+            device_profiler.save_telemetry(telemetry_filename)
+
     # message to the user about the quick deploy ending
     usr_msg = "\nThe Device Profiler script has completed running!\n"  
     print(colorama.Fore.MAGENTA + usr_msg)
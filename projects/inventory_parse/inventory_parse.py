@@ -16,6 +16,24 @@ import collections
 #import csv library for command output
 import csv
 
+# import the inventory store, checkpoint journal and sweep trace
+# shared with inventory search and device profiler
+from inventory_store import (InventoryStore, CheckpointJournal, SweepTrace,
+                             _display_inventory_delta, _display_sweep_summary)
+
+# import re to tokenize the show inventory output
+import re
+
+# a single field of show inventory, i.e. NAME: "3725 chassis" or SN: FTX0945W0MY
+# group 2 is a quoted value, which ends at a quote followed by a comma or the end
+# of the line so quotes inside a description are kept
+# group 3 is an unquoted value which ends at a comma or the end of the line
+# only spaces and tabs are skipped around the colon, so an empty SN never
+# runs on into the next line
+INVENTORY_FIELD = re.compile(r'\b(NAME|DESCR|PID|VID|SN)[ \t]*:[ \t]*'
+                             r'(?:"([^"\r\n]*(?:"[^"\r\n]*)*?)"(?=[ \t]*(?:,|\r?$))|([^,\r\n]*))',
+                             re.IGNORECASE | re.MULTILINE)
+
 # initiate colorama which is required for windows
 # autoreset also allows to clear colorama settings per print statement
 colorama.init(autoreset=True)
@@ -125,6 +143,9 @@ def inventory_parse():
     
     # get log filename
     log_filename = input('\nPlease provide an output filename: ').strip()
+
+    # get trace filename
+    trace_filename = input('\nPlease provide a trace filename (leave blank to skip): ').strip()
     
     # build devices list
     devices = _read_file('devices.txt')
@@ -145,6 +166,15 @@ def inventory_parse():
                                          'Product Version', 'Serial Number'
                                         ])
     
+    # load the results of previous sweeps that were interrupted
+    journal = CheckpointJournal('inventory_parse.journal')
+
+    # open the inventory store to track hardware changes between runs
+    inventory_store = InventoryStore('inventory.db')
+
+    # time every phase of every device
+    sweep_trace = SweepTrace()
+
     for device in devices:
         # if the user has provided the device type
         if ',' in device:
@@ -155,6 +185,19 @@ def inventory_parse():
             # initialize device type
             # by default set to cisco ios to play it safe
             device_type = 'cisco_ios'
+
+        # reuse the journaled inventory if the device was polled recently
+        parsed_inventory = journal.fresh(device)
+        if parsed_inventory is not None:
+            usr_msg = "\nSkipping " + device.upper() + " - already collected"
+            print(colorama.Fore.CYAN + usr_msg)
+
+            # write the journaled inventory to the csv log file
+            _write_inventory_rows(inventory_parse_csv_writer, device, parsed_inventory)
+
+            # persist any hardware change since the last run
+            _display_inventory_delta(device, inventory_store.update(device, parsed_inventory))
+            continue
             
         # provide context for user
         usr_msg = "\nConnecting to " + device.upper()
@@ -171,7 +214,9 @@ def inventory_parse():
 
         # initialize the connection handler of netmiko
         try:
-            net_connect = netmiko.ConnectHandler(**network_device_profile)
+            # the ssh connection and the authentication happen together
+            with sweep_trace.phase(device, 'connect'):
+                net_connect = netmiko.ConnectHandler(**network_device_profile)
             
         # in case of authentication failure
         # user will be informed and the program will exit
@@ -201,36 +246,35 @@ def inventory_parse():
             return
             
         # enter enable mode if required
-        if net_connect.find_prompt().endswith('>'):
-            net_connect.enable()
+        with sweep_trace.phase(device, 'enable'):
+            if net_connect.find_prompt().endswith('>'):
+                net_connect.enable()
             
         # message to user to show inventory information is being collected
         usr_msg = "Collecting Inventory...."
         print(colorama.Fore.CYAN + usr_msg)
                 
         # collect unformatted inventory information
-        inventory_output = net_connect.send_command('show inventory')
+        with sweep_trace.phase(device, 'command', 'show inventory') as event:
+            inventory_output = net_connect.send_command('show inventory')
+            event['bytes'] = len(inventory_output.encode())
         
-        # parse raw output of routing table
-        parsed_inventory = _parse_inventory(inventory_output)
-        
-        # iterate over parsed_routing_table dictionary items
-        for inventory_part, inventory_values in parsed_inventory.items():
-        
-            # store values in readable names for output
-            description = inventory_values['descr']
-            product_id = inventory_values['pid']
-            serial_number = inventory_values['sn']
-            product_version = inventory_values['vid']
-                
-            # write information to csv log file
-            inventory_parse_csv_writer.writerow([device, inventory_part, 
-                                                description, product_id, 
-                                                product_version, serial_number
-                                                ])
-                                           
         # disconnect from the device            
-        net_connect.disconnect()
+        with sweep_trace.phase(device, 'disconnect'):
+            net_connect.disconnect()
+
+        # parse raw output of routing table
+        with sweep_trace.phase(device, 'parse'):
+            parsed_inventory = _parse_inventory(inventory_output)
+
+        # journal the inventory so a re-run can skip this device
+        journal.record(device, parsed_inventory)
+
+        # write information to csv log file
+        _write_inventory_rows(inventory_parse_csv_writer, device, parsed_inventory)
+
+        # persist any hardware change since the last run
+        _display_inventory_delta(device, inventory_store.update(device, parsed_inventory))
         
         # message to user to show mac table information is done being collected
         usr_msg = "Done!"
@@ -238,16 +282,47 @@ def inventory_parse():
         
     # close csv log file
     inventory_parse_csv.close()
+
+    # close the inventory store
+    inventory_store.close()
+
+    # display where the time of the sweep went
+    _display_sweep_summary(sweep_trace)
+
+    # write the trace of the sweep
+    if trace_filename:
+        sweep_trace.save(trace_filename)
     
     # message to the user about the mac arp parse ending
     usr_msg = "\nThe Inventory Parse script has completed running!\n"
         
     print(colorama.Fore.MAGENTA + usr_msg)
 
+
+def _write_inventory_rows(inventory_parse_csv_writer, device, parsed_inventory):
+    """ write inventory rows
+    writes the parsed inventory of a device to the csv log file """
+
+    # iterate over parsed_routing_table dictionary items
+    for inventory_part, inventory_values in parsed_inventory.items():
+
+        # store values in readable names for output
+        description = inventory_values['descr']
+        product_id = inventory_values['pid']
+        serial_number = inventory_values['sn']
+        product_version = inventory_values['vid']
+
+        # write information to csv log file
+        inventory_parse_csv_writer.writerow([device, inventory_part,
+                                            description, product_id,
+                                            product_version, serial_number
+                                            ])
     
 def _parse_inventory(inventory_output):
     """ _parse_inventory
     parses the inventory output into a sorted dictionary
+    fields are tokenized in a single pass and anything that does not look
+    like a field is skipped, so unexpected output never aborts the device
     
     returns
     --------------
@@ -264,59 +339,39 @@ def _parse_inventory(inventory_output):
     ## Example raw format from show inventory
     # NAME: "3725 chassis", DESCR: "3725 chassis"
     # PID:                   , VID: 0.1, SN: FTX0945W0MY
-    
+
     # initialize dictionaries
     inventory_dict_single = {}
     inventory_dict_all = {}
 
-    # iterate over each line from show inventory output
-    for line in inventory_output.splitlines():
-    
-        # strip white trailing white space
-        line = line.strip()
-            
-        # remove quotations in the description of devices
-        inventory_segments = line.replace('"','')
-        
-        # split on comma, which separates the different inventory parameters
-        inventory_segments = inventory_segments.split(',')
-                
-        # If line is blank, continue as it doesn't contain any interesting info
-        if line == '':
-            continue
-            
-        # iterate over each inventory parameter and separate the field name and value
-        for inventory_segment in inventory_segments:
-            
-            # Format of inventory output is always Field name: Field value
-            field_name, field_value = inventory_segment.split(':')
-            
-            # make field_name lower case and remove trailing white space
-            field_name = field_name.strip()
-            field_name = field_name.lower()
-            
-            # remove trailing white space from field_value
-            field_value = field_value.strip()
-            
-            # if this is a new part, create a new dictionary
-            if line.lower().startswith('name'):
-                
-                # store the dictionary key for this inventory part
-                inventory_name = field_value
-            
-            # store part parameters into a dictionary
-            inventory_dict_single[field_name] = field_value
-        
-        # flag to know when last piece of information for this part is complete
-        if line.lower().startswith('pid'):
-        
+    # walk every field of the output in a single pass
+    # quoted values are consumed whole so colons and commas inside them
+    # are never mistaken for the start of another field
+    for field_name, quoted_value, field_value in INVENTORY_FIELD.findall(inventory_output):
+
+        # make field_name lower case
+        field_name = field_name.lower()
+
+        # quoted values are in the second group and everything else is in the third
+        if quoted_value:
+            field_value = quoted_value
+        else:
+            field_value = field_value.strip().strip('"')
+
+        # every part starts with its name so this is a new part
+        if field_name == 'name':
+            inventory_dict_single = {'name': field_value, 'descr': '', 'pid': '', 'vid': '', 'sn': ''}
+
             # store dictionary of one inventory part into a larger dictionary
-            inventory_dict_all[inventory_name] = inventory_dict_single
-            
-            # reset dictionary
-            inventory_dict_single = {}
+            inventory_dict_all[field_value] = inventory_dict_single
+
+        # store part parameters into the dictionary of the current part
+        # fields found before the first name are ignored
+        elif inventory_dict_single:
+            inventory_dict_single[field_name] = field_value
+
+    return inventory_dict_all
+
 
-    return inventory_dict_all      
-            
 if __name__ == '__main__':
     inventory_parse()
\ No newline at end of file
@@ -0,0 +1,126 @@
+""" inventory parse benchmark
+times the show inventory parser against a large generated chassis
+and compares it with the original split based parser """
+
+# import the parser being benchmarked
+from inventory_parse import _parse_inventory
+
+# import timeit to time the parsers
+import timeit
+
+def _build_inventory_output(number_of_parts):
+    """ build inventory output
+    generates show inventory output of a large chassis full of optics
+
+    returns
+    -------
+    inventory_output
+        str variable representing the raw show inventory output
+    expected_inventory
+        dict representing what the parser should find, keyed by part name
+
+    """
+
+    # initialize the raw output lines and the expected parts
+    lines = []
+    expected_inventory = {}
+
+    # iterate through the parts of the chassis
+    for part in range(number_of_parts):
+        # every tenth part is a linecard and the rest are optics
+        if part % 10 == 0:
+            name = 'module ' + str(part // 10 + 1)
+            descr = '36x40G/100G Ethernet Module'
+            pid = 'N9K-X9736C-FX'
+        else:
+            name = 'Ethernet' + str(part // 10 + 1) + '/' + str(part % 10)
+            descr = 'QSFP 100GBASE SR4'
+            pid = 'QSFP-100G-SR4-S'
+
+        # some fans and power supplies have no serial number at all
+        sn = '' if part % 7 == 3 else 'FOC' + str(part).zfill(8)
+
+        lines.append('NAME: "' + name + '", DESCR: "' + descr + '"')
+        lines.append('PID: ' + pid + '    , VID: V01 , SN: ' + sn)
+        lines.append('')
+
+        expected_inventory[name] = {'name': name, 'descr': descr, 'pid': pid, 'vid': 'V01', 'sn': sn}
+
+    return '\n'.join(lines), expected_inventory
+
+def _legacy_parse_inventory(inventory_output):
+    """ legacy parse inventory
+    the original parser, kept here as the baseline of the benchmark
+    it splits every line on commas and colons and lowercases it several times
+    note that it keys each part by the last field of its name line (the description) """
+
+    # initialize dictionaries
+    inventory_dict_single = {}
+    inventory_dict_all = {}
+
+    # iterate over each line from show inventory output
+    for line in inventory_output.splitlines():
+        line = line.strip()
+        inventory_segments = line.replace('"','').split(',')
+
+        if line == '':
+            continue
+
+        # iterate over each inventory parameter and separate the field name and value
+        for inventory_segment in inventory_segments:
+            field_name, field_value = inventory_segment.split(':')
+            field_name = field_name.strip().lower()
+            field_value = field_value.strip()
+
+            if line.lower().startswith('name'):
+                inventory_name = field_value
+
+            inventory_dict_single[field_name] = field_value
+
+        if line.lower().startswith('pid'):
+            inventory_dict_all[inventory_name] = inventory_dict_single
+            inventory_dict_single = {}
+
+    return inventory_dict_all
+
+def inventory_parse_benchmark():
+    """ main
+    main function that is the catalyst of the script by executing all
+    other functions """
+
+    # iterate through chassis sizes
+    for number_of_parts in (100, 1000, 5000):
+        inventory_output, expected_inventory = _build_inventory_output(number_of_parts)
+
+        # make sure every part is parsed exactly before timing the parser
+        # the legacy parser keys parts by description so it is not compared here
+        assert _parse_inventory(inventory_output) == expected_inventory
+
+        # time the best of several runs of each parser
+        legacy_time = min(timeit.repeat(lambda: _legacy_parse_inventory(inventory_output),
+                                        number=10, repeat=3)) / 10
+        parse_time = min(timeit.repeat(lambda: _parse_inventory(inventory_output),
+                                       number=10, repeat=3)) / 10
+
+        print(f'{number_of_parts:>6} parts: legacy {legacy_time * 1000:8.2f} ms, '
+              f'single pass {parse_time * 1000:8.2f} ms, '
+              f'{legacy_time / parse_time:4.1f}x')
+
+    # a description containing colons and commas crashes the legacy parser
+    inventory_output = 'NAME: "Slot 1", DESCR: "Supervisor: 8-core, 32GB"\n'
+    inventory_output += 'PID: N9K-SUP-B+ , VID: V01 , SN: FOC12345678\n'
+    print('\nvalues with colons and commas:', _parse_inventory(inventory_output))
+
+    # an empty serial number must not swallow the next part
+    inventory_output = 'NAME: "Fan 1", DESCR: "Fan Module"\n'
+    inventory_output += 'PID: N9K-FAN , VID: V01 , SN:\n'
+    inventory_output += 'NAME: "Ethernet1/1", DESCR: "QSFP "SR4" 100G"\n'
+    inventory_output += 'PID: QSFP-100G-SR4 , VID: V02 , SN: AVF123\n'
+    assert _parse_inventory(inventory_output) == {
+        'Fan 1': {'name': 'Fan 1', 'descr': 'Fan Module', 'pid': 'N9K-FAN', 'vid': 'V01', 'sn': ''},
+        'Ethernet1/1': {'name': 'Ethernet1/1', 'descr': 'QSFP "SR4" 100G', 'pid': 'QSFP-100G-SR4',
+                        'vid': 'V02', 'sn': 'AVF123'}}
+    print('empty serial numbers:', _parse_inventory(inventory_output))
+
+if __name__ == '__main__':
+    inventory_parse_benchmark()
@@ -0,0 +1,94 @@
+""" inventory search
+searches the inventory database built by inventory parse and device profiler
+for serial numbers, product ids and descriptions across the whole fleet """
+
+# import the inventory store, which does not need netmiko
+from inventory_store import InventoryStore
+
+# import cli coloring library
+import colorama
+
+# import sqlite3 for the errors of the inventory database
+import sqlite3
+
+# initiate colorama which is required for windows
+# autoreset also allows to clear colorama settings per print statement
+colorama.init(autoreset=True)
+
+def inventory_search():
+    """ main
+    main function that is the catalyst of the script by executing all
+    other functions """
+
+    # message to the user about the inventory search script
+    usr_msg = "# Inventory Search"
+    usr_msg += "\n# Finds serial numbers, product ids and descriptions across the fleet!\n"
+    print(colorama.Fore.YELLOW + usr_msg)
+
+    # open the inventory database in read only mode
+    try:
+        inventory_store = InventoryStore('inventory.db', read_only=True)
+
+    # the database is created by inventory parse or device profiler
+    except sqlite3.Error:
+        usr_msg = "\nAlert: No inventory database was found."
+        usr_msg += " Please run inventory_parse.py first.\n"
+        print(colorama.Fore.RED + usr_msg)
+
+        return
+
+    # keep running till user decides to exit out
+    while True:
+        # ask user for a query
+        usr_msg = "\nPlease provide a query such as sn:FOC1234X5YZ, pid:QSFP* or descr:100G*"
+        usr_msg += " (type 'q' to quit): "
+        usr_inp = input(usr_msg).strip()
+
+        # quit loop if conditions are met
+        if usr_inp.lower() == 'q':
+            break
+
+        # a query without a field is assumed to be a serial number
+        field = 'sn'
+        value = usr_inp
+        if ':' in usr_inp:
+            field = usr_inp.split(':', 1)[0].strip().lower()
+            value = usr_inp.split(':', 1)[1].strip()
+
+        # only indexed fields can be searched
+        if field not in ('sn', 'pid', 'descr'):
+            usr_msg = "Unknown field " + field + ". Please use sn, pid or descr."
+            print(colorama.Fore.RED + usr_msg)
+
+            continue
+
+        # a trailing * is a prefix search
+        prefix = value.endswith('*')
+        value = value.rstrip('*')
+
+        # display every matching part to the user
+        parts = inventory_store.search(field, value, prefix)
+        for device, name, sn, pid, descr in parts:
+            usr_msg = device + ' | ' + name + ' | ' + pid + ' | ' + sn + ' | ' + descr
+            print(colorama.Fore.CYAN + usr_msg)
+
+        usr_msg = str(len(parts)) + " part(s) found."
+        print(colorama.Fore.MAGENTA + usr_msg)
+
+        # an exact serial number search also shows where the part has been
+        if field == 'sn' and not prefix:
+            for timestamp, device, name, change, old_sn, new_sn in inventory_store.serial_history(value):
+                usr_msg = timestamp + ' ' + device + ' ' + change + ': ' + name
+                if change == 'replaced':
+                    usr_msg += ' (' + old_sn + ' -> ' + new_sn + ')'
+                print(colorama.Fore.YELLOW + usr_msg)
+
+    # close the inventory database
+    inventory_store.close()
+
+    # message to the user about the inventory search ending
+    usr_msg = "\nThe Inventory Search script has completed running!\n"
+    print(colorama.Fore.MAGENTA + usr_msg)
+
+if __name__ == '__main__':
+    inventory_search()
@@ -0,0 +1,433 @@
+""" inventory store
+sqlite store of the show inventory parts of every device together with the
+checkpoint journal and sweep trace of a collection run, shared by inventory
+parse and device profiler and kept apart from the collection so searching
+the fleet does not need netmiko """
+
+# import cli coloring library
+import colorama
+
+# import json, os and time for the checkpoint journal
+import json
+import os
+import time
+
+# import sqlite3 and datetime for the inventory store
+import sqlite3
+import datetime
+
+# import contextlib and threading for the sweep trace
+import contextlib
+import threading
+
+class CheckpointJournal:
+    """ checkpoint journal
+    durably records the parsed result of every device as soon as it completes
+    so an interrupted sweep can resume without re-polling finished devices
+
+    the journal is a json lines file with one entry per completed device """
+
+    def __init__(self, filename, max_age=86400):
+        # store the file the journal is kept in
+        self.filename = filename
+
+        # number of seconds a journaled result is considered fresh
+        self.max_age = max_age
+
+        # set up entries datastructure
+        # device -> { 'device': device, 'timestamp': 1580000000.0, 'result': {...} }
+        self.entries = {}
+
+        # initialize number of lines read from the journal
+        lines_read = 0
+
+        try:
+            # open a context handler for the file
+            with open(self.filename, 'r') as journal_file:
+                for line in journal_file:
+                    lines_read += 1
+
+                    # a sweep killed halfway through a write leaves a partial line
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+
+                    # later entries of the same device replace earlier ones
+                    self.entries[entry['device']] = entry
+        # if file was not found - this is the first run
+        except FileNotFoundError:
+            pass
+
+        # compact the journal down to the latest entry of each device
+        if lines_read > len(self.entries):
+            with open(self.filename + '.tmp', 'w') as journal_file:
+                for entry in self.entries.values():
+                    journal_file.write(json.dumps(entry) + '\n')
+
+            os.replace(self.filename + '.tmp', self.filename)
+
+    def fresh(self, device):
+        """ fresh
+        looks up the journaled result of a device
+
+        returns
+        -------
+        result
+            the journaled result of the device
+            None if the device was not journaled or its result is too old
+
+        """
+
+        entry = self.entries.get(device)
+
+        # device was not journaled or was journaled too long ago
+        if entry is None or time.time() - entry['timestamp'] > self.max_age:
+            return None
+
+        return entry['result']
+
+    def record(self, device, result):
+        """ record
+        appends the result of a device to the journal and flushes it to disk """
+
+        entry = {'device': device, 'timestamp': time.time(), 'result': result}
+        self.entries[device] = entry
+
+        # append and fsync so the entry survives the script being killed
+        with open(self.filename, 'a') as journal_file:
+            journal_file.write(json.dumps(entry) + '\n')
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+
+class InventoryStore:
+    """ inventory store
+    keeps the latest inventory of every device keyed by (device, name, sn)
+    and persists only the parts that changed between runs
+
+    changes are recorded as inserted, removed or replaced (same slot,
+    different serial number) so the history of any serial number can be
+    looked up across the whole fleet """
+
+    def __init__(self, filename, read_only=False):
+        # open the store read only for the scripts that only search it
+        # a missing database or table raises sqlite3.Error
+        if read_only:
+            self.connection = sqlite3.connect('file:' + filename + '?mode=ro', uri=True)
+            self.connection.execute('SELECT 1 FROM inventory_parts LIMIT 1')
+            return
+
+        # open the sqlite database holding the store
+        self.connection = sqlite3.connect(filename)
+
+        # build the tables and indexes if this is the first run
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS inventory_parts (
+                device TEXT, name TEXT, sn TEXT, descr TEXT, pid TEXT, vid TEXT,
+                PRIMARY KEY (device, name, sn)
+            );
+            CREATE TABLE IF NOT EXISTS inventory_changes (
+                id INTEGER PRIMARY KEY, timestamp TEXT, device TEXT, name TEXT,
+                change TEXT, old_sn TEXT, new_sn TEXT, pid TEXT, descr TEXT
+            );
+            CREATE INDEX IF NOT EXISTS inventory_changes_old_sn ON inventory_changes (old_sn);
+            CREATE INDEX IF NOT EXISTS inventory_changes_new_sn ON inventory_changes (new_sn);
+            CREATE INDEX IF NOT EXISTS inventory_parts_sn ON inventory_parts (sn COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS inventory_parts_pid ON inventory_parts (pid COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS inventory_parts_descr ON inventory_parts (descr COLLATE NOCASE);
+        ''')
+
+    def update(self, device, parsed_inventory):
+        """ update
+        compares the parsed inventory of a device with the stored inventory
+        and persists the difference
+
+        returns
+        -------
+        delta
+            list representing every part that changed on the device
+            each entry in list will be a dictionary
+
+            example format listed below:
+
+            [
+                { 'name': 'module 1', 'change': 'replaced', 'old_sn': 'FOC1',
+                  'new_sn': 'FOC2', 'pid': 'N9K-X9732C-EX', 'descr': '32p 100G' }
+            ]
+
+        """
+
+        # initialize the stored parts of the device keyed by (name, sn)
+        stored_parts = {}
+        for name, sn, pid, descr in self.connection.execute(
+                'SELECT name, sn, pid, descr FROM inventory_parts WHERE device = ?', (device,)):
+            stored_parts[(name, sn)] = (pid, descr)
+
+        # initialize the parsed parts of the device keyed by (name, sn)
+        parsed_parts = {}
+        for inventory_part, inventory_values in parsed_inventory.items():
+            parsed_parts[(inventory_part, inventory_values['sn'])] = inventory_values
+
+        # parts that disappeared, grouped by name to detect replacements
+        removed_parts = {}
+        for name, sn in stored_parts.keys() - parsed_parts.keys():
+            removed_parts.setdefault(name, []).append(sn)
+
+        # initialize delta
+        delta = []
+
+        # parts that appeared are inserted, or replaced if their slot lost a part
+        for name, sn in sorted(parsed_parts.keys() - stored_parts.keys()):
+            inventory_values = parsed_parts[(name, sn)]
+            old_sn = ''
+            change = 'inserted'
+
+            if removed_parts.get(name):
+                old_sn = removed_parts[name].pop()
+                change = 'replaced'
+
+            delta.append({'name': name, 'change': change, 'old_sn': old_sn, 'new_sn': sn,
+                          'pid': inventory_values['pid'], 'descr': inventory_values['descr']})
+
+        # whatever is left over was removed without a replacement
+        for name, sns in sorted(removed_parts.items()):
+            for sn in sns:
+                pid, descr = stored_parts[(name, sn)]
+                delta.append({'name': name, 'change': 'removed', 'old_sn': sn, 'new_sn': '',
+                              'pid': pid, 'descr': descr})
+
+        # nothing to persist if the device did not change
+        if not delta:
+            return delta
+
+        # persist the changes in one transaction
+        timestamp = datetime.datetime.now().isoformat(timespec='seconds')
+        with self.connection:
+            self.connection.executemany(
+                'DELETE FROM inventory_parts WHERE device = ? AND name = ? AND sn = ?',
+                [(device, name, sn) for name, sn in stored_parts.keys() - parsed_parts.keys()])
+
+            self.connection.executemany(
+                'INSERT INTO inventory_parts VALUES (?, ?, ?, ?, ?, ?)',
+                [(device, name, sn, parsed_parts[(name, sn)]['descr'],
+                  parsed_parts[(name, sn)]['pid'], parsed_parts[(name, sn)]['vid'])
+                 for name, sn in parsed_parts.keys() - stored_parts.keys()])
+
+            self.connection.executemany(
+                'INSERT INTO inventory_changes (timestamp, device, name, change, old_sn, new_sn, pid, descr)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(timestamp, device, change['name'], change['change'], change['old_sn'],
+                  change['new_sn'], change['pid'], change['descr']) for change in delta])
+
+        return delta
+
+    def serial_history(self, sn):
+        """ serial history
+        looks up every change a serial number was part of across the fleet
+
+        returns
+        -------
+        history
+            list representing the changes in the order they happened
+            each entry is a tuple of timestamp, device, name, change, old_sn, new_sn
+
+        """
+
+        # both serial number columns are indexed so this does not scan the table
+        return self.connection.execute(
+            'SELECT timestamp, device, name, change, old_sn, new_sn FROM inventory_changes'
+            ' WHERE old_sn = ? OR new_sn = ? ORDER BY id', (sn, sn)).fetchall()
+
+    def search(self, field, value, prefix=False):
+        """ search
+        finds every part in the fleet by serial number, product id or description
+        matching is case insensitive and can be exact or on a prefix
+
+        returns
+        -------
+        parts
+            list representing the matching parts
+            each entry is a tuple of device, name, sn, pid, descr
+
+        """
+
+        # only indexed fields can be searched
+        if field not in ('sn', 'pid', 'descr'):
+            raise ValueError('cannot search inventory by ' + field)
+
+        # an exact match is a single index lookup
+        if not prefix:
+            query = 'SELECT device, name, sn, pid, descr FROM inventory_parts'
+            query += ' WHERE ' + field + ' = ? COLLATE NOCASE ORDER BY device, name'
+            return self.connection.execute(query, (value,)).fetchall()
+
+        # a prefix match is written as a range so it is also an index lookup
+        query = 'SELECT device, name, sn, pid, descr FROM inventory_parts'
+        query += ' WHERE ' + field + ' >= ? COLLATE NOCASE AND ' + field + ' < ? COLLATE NOCASE'
+        query += ' ORDER BY device, name'
+        return self.connection.execute(query, (value, value + '\U0010ffff')).fetchall()
+
+    def close(self):
+        """ close
+        closes the sqlite database """
+
+        self.connection.close()
+
+def _display_inventory_delta(device, delta):
+    """ display inventory delta
+    informs the user of every part that changed on the device """
+
+    # iterate through the changed parts
+    for change in delta:
+        usr_msg = device + ' ' + change['change'] + ': ' + change['name']
+
+        if change['change'] == 'replaced':
+            usr_msg += ' (' + change['old_sn'] + ' -> ' + change['new_sn'] + ')'
+        else:
+            usr_msg += ' (' + (change['new_sn'] or change['old_sn']) + ')'
+
+        print(colorama.Fore.YELLOW + usr_msg)
+
+def _percentile(sorted_values, percent):
+    """ percentile
+    nearest rank percentile of a sorted list of values
+
+    returns
+    -------
+    value
+        float variable representing the percentile of the values
+
+    """
+
+    # nearest rank, i.e. the 50th percentile of 4 values is the 2nd value
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+
+    return sorted_values[int(rank) - 1]
+
+class SweepTrace:
+    """ sweep trace
+    times every phase of every device during a sweep, i.e. connect,
+    enable, each command and the parsing, together with the bytes received
+    per command and the cpu time spent parsing """
+
+    def __init__(self):
+        # every timing is relative to the start of the sweep
+        self.start = time.perf_counter()
+
+        # set up events datastructure
+        # one dictionary per phase of a device
+        self.events = []
+
+        # devices may be traced from several threads at once
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, device, name, command=None):
+        """ phase
+        times a phase of a device
+        the event is handed to the caller so the bytes received can be added """
+
+        # initialize the event of the phase
+        event = {'device': device, 'phase': name, 'thread': threading.get_ident()}
+        if command:
+            event['command'] = command
+
+        # wall clock and cpu time of the current thread at the start of the phase
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+
+        try:
+            yield event
+
+        # phases that fail are recorded as well
+        finally:
+            event['start'] = wall_start - self.start
+            event['duration'] = time.perf_counter() - wall_start
+            event['cpu'] = time.thread_time() - cpu_start
+
+            with self.lock:
+                self.events.append(event)
+
+    def save(self, filename):
+        """ save
+        writes the events as json lines and as a chrome trace
+        the chrome trace can be opened in chrome://tracing or ui.perfetto.dev """
+
+        # one event per line to grep or load into a dataframe
+        with open(filename + '.jsonl', 'w') as fn:
+            for event in self.events:
+                fn.write(json.dumps(event) + '\n')
+
+        # complete events with the start and duration in microseconds
+        # every device is drawn on the thread that traced it
+        trace_events = []
+        for event in self.events:
+            trace_events.append({
+                'name': event['phase'] + (' ' + event['command'] if 'command' in event else ''),
+                'cat': event['phase'],
+                'ph': 'X',
+                'ts': round(event['start'] * 1000000),
+                'dur': round(event['duration'] * 1000000),
+                'pid': 1,
+                'tid': event['thread'],
+                'args': {key: value for key, value in event.items()
+                         if key in ('device', 'command', 'bytes', 'cpu')},
+            })
+
+        with open(filename + '.trace.json', 'w') as fn:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, fn)
+
+    def summary(self):
+        """ summary
+        summarizes the duration of every phase across the devices
+
+        returns
+        -------
+        summary
+            list representing one row per phase in the order they first happened
+            each entry is a tuple of phase, count, p50, p90, p99, max in
+            milliseconds and the total bytes received
+
+        """
+
+        # set up phases datastructure
+        # phase -> list of events
+        phases = {}
+        for event in self.events:
+            phases.setdefault(event['phase'], []).append(event)
+
+        # initialize summary
+        summary = []
+
+        for phase, events in phases.items():
+            durations = sorted(event['duration'] * 1000 for event in events)
+            total_bytes = sum(event.get('bytes', 0) for event in events)
+
+            summary.append((phase, len(durations),
+                            _percentile(durations, 50), _percentile(durations, 90),
+                            _percentile(durations, 99), durations[-1], total_bytes))
+
+        return summary
+
+def _display_sweep_summary(sweep_trace):
+    """ display sweep summary
+    displays the percentiles of every phase of the sweep to the user """
+
+    # nothing to display if every device was skipped
+    if not sweep_trace.events:
+        return
+
+    usr_msg = "\n" + "Phase".ljust(16) + "Count".rjust(7) + "p50 ms".rjust(11)
+    usr_msg += "p90 ms".rjust(11) + "p99 ms".rjust(11) + "Max ms".rjust(11) + "Bytes".rjust(12)
+    print(colorama.Fore.MAGENTA + usr_msg)
+
+    for phase, count, p50, p90, p99, maximum, total_bytes in sweep_trace.summary():
+        usr_msg = phase.ljust(16) + str(count).rjust(7)
+        usr_msg += ''.join(f'{value:11.1f}' for value in (p50, p90, p99, maximum))
+        usr_msg += str(total_bytes).rjust(12)
+        print(colorama.Fore.CYAN + usr_msg)
+
+    # parsing is the only phase that runs on this machine
+    parse_cpu = sum(event['cpu'] for event in sweep_trace.events if event['phase'] == 'parse')
+    usr_msg = f"\nParser cpu time: {parse_cpu * 1000:.1f} ms"
+    print(colorama.Fore.CYAN + usr_msg)
@@ -10,10 +10,22 @@ import colorama
 # import input library for passwords
 import getpass
 
+# import os to find the key file of the session pool
+import os
+
+# import multiprocessing to borrow sessions from the session pool
+import multiprocessing
+from multiprocessing.managers import BaseManager
+
 # import networkx and matplotlib for graphing purposes
 import networkx as nx
 import matplotlib.pyplot as plt
 
+# address and key file of the session pool script
+# scripts borrow their sessions from it when it is running
+SESSION_POOL_ADDRESS = ('127.0.0.1', 50505)
+SESSION_POOL_KEYFILE = os.path.join(os.path.expanduser('~'), '.networkcoder_session_pool.key')
+
 # initiate colorama which is required for windows
 # autoreset also allows to clear colorama settings per print statement
 colorama.init(autoreset=True)
@@ -108,6 +120,74 @@ def _read_file(filename):
     # return user items
     return user_items
 
+class SessionPoolManager(BaseManager):
+    """ session pool manager
+    client side of the session pool script """
+
+# the session pool only serves the session pool object
+SessionPoolManager.register('session_pool')
+
+def _connect_session_pool():
+    """ connect session pool
+    connects to the session pool script if it is running
+
+    returns
+    -------
+    session_pool
+        proxy of the session pool or None if the session pool is not running
+
+    """
+
+    try:
+        # read the key written by the session pool
+        with open(SESSION_POOL_KEYFILE, 'rb') as keyfile:
+            authkey = keyfile.read().strip()
+
+        # connect to the session pool
+        manager = SessionPoolManager(address=SESSION_POOL_ADDRESS, authkey=authkey)
+        manager.connect()
+
+        return manager.session_pool()
+
+    # fall back to direct connections if the session pool is not running
+    except (OSError, EOFError, multiprocessing.AuthenticationError):
+        return None
+
+class BorrowedSession:
+    """ borrowed session
+    stands in for a napalm driver and runs every getter over the session
+    held by the session pool, closing it only hands the session back """
+
+    def __init__(self, session_pool, device, device_type, username, password, secret):
+        # session pool proxy
+        self.session_pool = session_pool
+
+        # arguments the session pool needs to find or open the session
+        self.session_args = (device, device_type, username, password, secret)
+
+        # oldest getter result in seconds the script accepts from the getter cache
+        # none accepts the max age of the session pool and 0 always asks the device
+        self.max_age = None
+
+    def open(self):
+        """ open
+        makes sure the session pool has an open session to the device """
+
+        self.session_pool.open(*self.session_args)
+
+    def close(self):
+        """ close
+        the session stays open in the session pool """
+
+    def __getattr__(self, getter):
+        """ getter
+        runs the napalm getter or method in the session pool """
+
+        def call(*args, **kwargs):
+            return self.session_pool.call(*self.session_args, getter, args, kwargs, self.max_age)
+
+        return call
+
 class MapNetworkBasic:
     """ map network basic
     logs into specified switches and generates a map of the connectivity """
@@ -119,6 +199,9 @@ class MapNetworkBasic:
         # build devices list
         self.devices = _read_file('devices.txt')
 
+        # borrow sessions from the session pool if it is running
+        self.session_pool = _connect_session_pool()
+
         # set up lldp info datastructure
         self.lldp_info = {}
 
@@ -177,18 +260,24 @@ class MapNetworkBasic:
             usr_msg = "\n# Retrieving neighbor information of: " + device.upper()
             print(colorama.Fore.MAGENTA + usr_msg)
 
-            # initialize the driver for napalm
-            driver = napalm.get_network_driver(device_type)
-
             # initialize the connection handler for napalm
             try:
-                # setup driver profile
-                net_connect = driver(
-                    hostname=device,
-                    username=self.username,
-                    password=self.password,
-                    optional_args={'secret': self.secret},
-                )
+                # borrow the session from the session pool if it is running
+                if self.session_pool is not None:
+                    net_connect = BorrowedSession(self.session_pool, device, device_type,
+                                                  self.username, self.password, self.secret)
+
+                else:
+                    # initialize the driver for napalm
+                    driver = napalm.get_network_driver(device_type)
+
+                    # setup driver profile
+                    net_connect = driver(
+                        hostname=device,
+                        username=self.username,
+                        password=self.password,
+                        optional_args={'secret': self.secret},
+                    )
 
                 # open connection
                 net_connect.open()
@@ -0,0 +1,109 @@
+""" accounting parse benchmark
+times the show accounting log parser against a large generated log
+and compares it with the original strptime based parser """
+
+# import the parser being benchmarked
+from accounting_store import _iter_accounting_entries
+
+# import datetime for the original parser
+import datetime
+
+# import timeit to time the parsers
+import timeit
+
+def _build_accounting_log_output(number_of_lines):
+    """ build accounting log output
+    generates show accounting log output of a busy switch with years of history
+
+    returns
+    -------
+    accounting_log_output
+        str variable representing the raw show accounting log output
+
+    """
+
+    # initialize the raw output lines
+    lines = []
+
+    # the log starts on a monday
+    start = datetime.datetime(2017, 1, 2)
+
+    # iterate through the entries of the log
+    for entry in range(number_of_lines):
+        # a few hundred entries are logged every day
+        timestamp = start + datetime.timedelta(seconds=entry * 300)
+        raw_timestamp = timestamp.strftime('%a %b %d %H:%M:%S %Y')
+        user = ('ethan', 'frank', 'admin')[entry % 3]
+        prefix = raw_timestamp + ':type=update:id=192.168.12.138@pts/3:user=' + user + ':cmd='
+
+        # every fourth line is not a configuration change
+        if entry % 4 == 0:
+            lines.append(prefix + 'show running-config (SUCCESS)')
+        elif entry % 4 == 1:
+            lines.append(prefix + 'configure terminal ; interface Ethernet1/' + str(entry % 48 + 1) + ' (SUCCESS)')
+        elif entry % 4 == 2:
+            lines.append(prefix + 'configure terminal ; interface Ethernet1/' + str(entry % 48 + 1)
+                         + ' ; description "uplink ' + str(entry) + '" (SUCCESS)')
+        else:
+            lines.append(prefix + 'configure terminal ; ip route 10.' + str(entry % 256)
+                         + '.0.0/16 192.168.12.1 (SUCCESS)')
+
+    return '\n'.join(lines)
+
+def _legacy_iter_accounting_entries(device_output):
+    """ legacy iter accounting entries
+    the original parser, kept here as the baseline of the benchmark
+    it calls strptime and strftime and splits the line several times per change """
+
+    # iterate through the device output
+    for line in device_output.splitlines():
+        # skip if this was not a configuration update
+        if 'configure' not in line:
+            continue
+        # skip if the configuration is not defined as success
+        elif not line.strip().endswith('(SUCCESS)'):
+            continue
+
+        # remove the success tag of the line
+        line = line.replace('(SUCCESS)', '')
+
+        # convert raw date from show command to a timestamp
+        raw_date_from_line = line.split('type')[0]
+        date_object = datetime.datetime.strptime(raw_date_from_line, '%a %b %d %H:%M:%S %Y:')
+        timestamp = date_object.strftime('%Y-%m-%d %H:%M:%S')
+
+        # grab user, change and depth from the line
+        user = line.split(':')[-2].split('=')[-1]
+        change = line.split(';')[-1].strip()
+        depth = line.count(';') - 1
+
+        yield timestamp, user, depth, change
+
+def accounting_parse_benchmark():
+    """ main
+    main function that is the catalyst of the script by executing all
+    other functions """
+
+    # iterate through log sizes
+    for number_of_lines in (1000, 100000, 500000):
+        accounting_log_output = _build_accounting_log_output(number_of_lines)
+
+        # make sure both parsers agree before timing them
+        # the legacy parser only knows the depth and the last line of the path
+        assert [(timestamp, user, len(path) - 1, path[-1]) for timestamp, user, path in
+                _iter_accounting_entries(accounting_log_output.splitlines())] == \
+            list(_legacy_iter_accounting_entries(accounting_log_output))
+
+        # time the best of several runs of each parser
+        legacy_time = min(timeit.repeat(lambda: list(_legacy_iter_accounting_entries(accounting_log_output)),
+                                        number=1, repeat=3))
+        parse_time = min(timeit.repeat(
+            lambda: list(_iter_accounting_entries(accounting_log_output.splitlines())),
+            number=1, repeat=3))
+
+        print(f'{number_of_lines:>7} lines: strptime {legacy_time * 1000:9.2f} ms, '
+              f'fast path {parse_time * 1000:9.2f} ms, '
+              f'{legacy_time / parse_time:4.1f}x')
+
+if __name__ == '__main__':
+    accounting_parse_benchmark()
@@ -0,0 +1,203 @@
+""" accounting search
+searches the accounting database built by nxos account parse and nxos blame
+for configuration changes across every nexus switch of the fleet """
+
+# import cli coloring library
+import colorama
+
+# import the tokenizer of the accounting store so the query is tokenized
+# the same way as the changes
+from accounting_store import _tokenize_change
+
+# import shlex to split the query while keeping quoted phrases together
+import shlex
+
+# import sqlite3 to read the accounting database
+import sqlite3
+
+# filters that can be added to a query, i.e. user:ethan
+ACCOUNTING_FILTERS = ('user', 'device', 'since', 'until')
+
+# most changes displayed for a single query
+MAX_RESULTS = 200
+
+# initiate colorama which is required for windows
+# autoreset also allows to clear colorama settings per print statement
+colorama.init(autoreset=True)
+
+def _parse_query(query):
+    """ parse query
+    splits a query into phrases and filters
+
+    returns
+    -------
+    phrases
+        list representing every phrase of the query
+        each phrase is a list of tokens, a token ending with * is a prefix
+    filters
+        dict representing the filters of the query
+
+        example format listed below:
+
+        '"ip route 0.0.0.0/0" user:ethan since:2020-01-01'
+        -> [['ip', 'route', '0.0.0.0/0']], {'user': 'ethan', 'since': '2020-01-01'}
+
+    """
+
+    # initialize phrases and filters
+    phrases = []
+    filters = {}
+
+    # quoted parts of the query are kept together as a phrase
+    for part in shlex.split(query):
+        # a known filter, i.e. user:ethan
+        key, separator, value = part.partition(':')
+        if separator and key.lower() in ACCOUNTING_FILTERS:
+            filters[key.lower()] = value
+            continue
+
+        # anything else is a phrase of one or more tokens
+        tokens = _tokenize_change(part)
+        if tokens:
+            phrases.append(tokens)
+
+    return phrases, filters
+
+def _search_accounting(connection, phrases, filters):
+    """ search accounting
+    finds every change that contains all phrases and matches all filters
+    every token is a lookup in the token index and the tokens of a phrase
+    must follow each other in the change
+
+    returns
+    -------
+    changes
+        list representing the matching changes, newest first
+        each entry is a tuple of device, timestamp, user and change
+
+    """
+
+    # initialize the joins, conditions and parameters of the query
+    joins = []
+    conditions = []
+    parameters = []
+
+    # iterate through the tokens of every phrase
+    for phrase_number, phrase in enumerate(phrases):
+        for token_number, token in enumerate(phrase):
+            alias = 't' + str(phrase_number) + '_' + str(token_number)
+            join = 'JOIN accounting_tokens ' + alias + ' ON ' + alias + '.device = e.device'
+            join += ' AND ' + alias + '.seq = e.seq'
+
+            # a trailing * is a prefix, written as a range so it is an index lookup
+            if token.endswith('*') and len(token) > 1:
+                join += ' AND ' + alias + '.token >= ? AND ' + alias + '.token < ?'
+                parameters += [token[:-1], token[:-1] + '\U0010ffff']
+            else:
+                join += ' AND ' + alias + '.token = ?'
+                parameters.append(token)
+
+            # the tokens of a phrase must follow each other
+            if token_number:
+                previous_alias = 't' + str(phrase_number) + '_' + str(token_number - 1)
+                join += ' AND ' + alias + '.position = ' + previous_alias + '.position + 1'
+
+            joins.append(join)
+
+    # add the filters
+    if 'user' in filters:
+        conditions.append('e.user = ?')
+        parameters.append(filters['user'])
+    if 'device' in filters:
+        conditions.append('e.device = ? COLLATE NOCASE')
+        parameters.append(filters['device'])
+    if 'since' in filters:
+        conditions.append('e.timestamp >= ?')
+        parameters.append(filters['since'])
+    if 'until' in filters:
+        # until is inclusive of the whole day
+        conditions.append('e.timestamp <= ?')
+        parameters.append(filters['until'] + ' 99:99:99')
+
+    # build the query
+    query = 'SELECT DISTINCT e.device, e.timestamp, e.user, e.change FROM accounting_entries e '
+    query += ' '.join(joins)
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY e.timestamp DESC, e.device LIMIT ' + str(MAX_RESULTS + 1)
+
+    return connection.execute(query, parameters).fetchall()
+
+def accounting_search():
+    """ main
+    main function that is the catalyst of the script by executing all
+    other functions """
+
+    # message to the user about the accounting search script
+    usr_msg = "# Accounting Search"
+    usr_msg += "\n# Finds who changed what on any nexus switch of the fleet!\n"
+    print(colorama.Fore.YELLOW + usr_msg)
+
+    # open the accounting database in read only mode
+    try:
+        connection = sqlite3.connect('file:accounting.db?mode=ro', uri=True)
+        connection.execute('SELECT 1 FROM accounting_tokens LIMIT 1')
+
+    # the database is created by nxos account parse or nxos blame
+    except sqlite3.Error:
+        usr_msg = "\nAlert: No accounting database was found."
+        usr_msg += " Please run nxos_account_parse.py first.\n"
+        print(colorama.Fore.RED + usr_msg)
+
+        return
+
+    # keep running till user decides to exit out
+    while True:
+        # ask user for a query
+        usr_msg = '\nPlease provide a query such as "ip route 0.0.0.0/0" since:2020-01-01,'
+        usr_msg += " user:ethan vlan* (type 'q' to quit): "
+        usr_inp = input(usr_msg).strip()
+
+        # quit loop if conditions are met
+        if usr_inp.lower() == 'q':
+            break
+
+        # split the query into phrases and filters
+        try:
+            phrases, filters = _parse_query(usr_inp)
+
+        # an unbalanced quote cannot be split
+        except ValueError:
+            usr_msg = "Unbalanced quotes in the query. Please try again."
+            print(colorama.Fore.RED + usr_msg)
+
+            continue
+
+        # a query without any phrase would list the whole history
+        if not phrases:
+            usr_msg = "Please provide at least one word to search for."
+            print(colorama.Fore.RED + usr_msg)
+
+            continue
+
+        # display every matching change to the user
+        changes = _search_accounting(connection, phrases, filters)
+        for device, timestamp, user, change in changes[:MAX_RESULTS]:
+            usr_msg = timestamp + ' | ' + device + ' | ' + user + ' | ' + change
+            print(colorama.Fore.CYAN + usr_msg)
+
+        if len(changes) > MAX_RESULTS:
+            usr_msg = "More than " + str(MAX_RESULTS) + " changes found, showing the newest."
+        else:
+            usr_msg = str(len(changes)) + " change(s) found."
+        print(colorama.Fore.MAGENTA + usr_msg)
+
+    # close the accounting database
+    connection.close()
+
+    # message to the user about the accounting search ending
+    usr_msg = "\nThe Accounting Search script has completed running!\n"
+    print(colorama.Fore.MAGENTA + usr_msg)
+
+if __name__ == '__main__':
+    accounting_search()
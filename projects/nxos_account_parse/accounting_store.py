@@ -0,0 +1,368 @@
+""" accounting store
+parsing and sqlite store of the nexus 'show accounting log' shared by
+nxos account parse, accounting search and nxos blame """
+
+# import datetime
+import datetime
+
+# import sqlite3 for the accounting store
+import sqlite3
+
+# import re to tokenize changes for the search index
+import re
+
+# import time to wait for the output of the ssh channel
+import time
+
+# month and weekday names of the accounting log timestamps
+ACCOUNTING_MONTHS = {'Jan': '01', 'Feb': '02', 'Mar': '03', 'Apr': '04',
+                     'May': '05', 'Jun': '06', 'Jul': '07', 'Aug': '08',
+                     'Sep': '09', 'Oct': '10', 'Nov': '11', 'Dec': '12'}
+ACCOUNTING_WEEKDAYS = {'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'}
+
+# a token of a configuration change for the search index
+# anything between whitespace and quotes, i.e. 0.0.0.0/0 or Ethernet1/10
+ACCOUNTING_TOKEN = re.compile(r'[^\s"\']+')
+
+# dates that have already been decoded
+# (year, month, day) -> date, i.e. ('2020', 'Feb', '10') -> '2020-02-10'
+ACCOUNTING_DATES = {}
+
+# entries stored per transaction, which bounds the memory of a long log
+ACCOUNTING_BATCH_SIZE = 10000
+
+# seconds to wait for more output of show accounting log
+ACCOUNTING_READ_TIMEOUT = 120
+
+def _decode_accounting_timestamp(raw_timestamp):
+    """ decode accounting timestamp
+    converts the cisco timestamp of an accounting entry to a timestamp that
+    sorts in the order of time, without strptime for the usual layout
+    the date part is decoded once per day and looked up afterwards
+
+    returns
+    -------
+    timestamp
+        str variable representing the timestamp
+
+        example format listed below:
+
+        Mon Feb 10 09:30:45 2020 -> 2020-02-10 09:30:45
+
+    """
+
+    # example: ['Mon', 'Feb', '10', '09:30:45', '2020']
+    timestamp_fields = raw_timestamp.split()
+
+    # the usual layout is decoded with lookups
+    if (len(timestamp_fields) == 5 and timestamp_fields[0] in ACCOUNTING_WEEKDAYS
+            and timestamp_fields[1] in ACCOUNTING_MONTHS):
+        weekday, month, day, time_of_day, year = timestamp_fields
+
+        # decode the date the first time it is seen
+        date_key = (year, month, day)
+        date = ACCOUNTING_DATES.get(date_key)
+        if date is None:
+            date = year + '-' + ACCOUNTING_MONTHS[month] + '-' + day.zfill(2)
+            ACCOUNTING_DATES[date_key] = date
+
+        return date + ' ' + time_of_day.zfill(8)
+
+    # anything unusual goes through strptime which also reports malformed timestamps
+    date_object = datetime.datetime.strptime(raw_timestamp.strip(), '%a %b %d %H:%M:%S %Y')
+
+    return date_object.strftime('%Y-%m-%d %H:%M:%S')
+
+def _iter_accounting_entries(accounting_log_lines):
+    """ iter accounting entries
+    helper function with the parsing logic for the show accounting log command
+    yields every successful configuration change in the order it was logged
+    the lines can be a whole output split into lines or streamed from the device
+
+    returns
+    -------
+    entries
+        iterator of tuples of timestamp, user and path
+        the path is the parent lines of the change followed by the change
+
+        example format listed below:
+
+        ('2020-02-10 09:30:45', 'ethan', ('interface Ethernet1/10', 'description "this is a new interface"'))
+
+    """
+
+    # iterate through the device output
+    for line in accounting_log_lines:
+        # skip if this was not a configuration update
+        if 'configure' not in line:
+            continue
+
+        # skip if the configuration is not defined as success
+        line = line.strip()
+        if not line.endswith('(SUCCESS)'):
+            continue
+
+        # split the line once into the timestamp and the fields
+        # example: Mon Feb 10 09:30:45 2020 | update:id=...:user=ethan:cmd=configure terminal ; ...
+        raw_timestamp, separator, fields = line.partition(':type=')
+
+        # find the user and the command in the fields
+        user_start = fields.find(':user=')
+        command_start = fields.find(':cmd=', user_start)
+
+        # skip lines that do not have the usual fields
+        if not separator or user_start < 0 or command_start < 0:
+            continue
+
+        # grab user from the line
+        user = fields[user_start + len(':user='):command_start]
+
+        # grab the command from the line without the success tag
+        command = fields[command_start + len(':cmd='):-len('(SUCCESS)')]
+
+        # every part of the command after configure terminal is a line of the path
+        # example: configure terminal ; interface Ethernet1/10 ; description test
+        path = tuple(part.strip() for part in command.split(';')[1:])
+
+        # skip entering configure terminal on its own, nothing was changed
+        if not path:
+            continue
+
+        yield _decode_accounting_timestamp(raw_timestamp), user, path
+
+def _tokenize_change(change):
+    """ tokenize change
+    splits a configuration change into lowercase tokens for the search index
+    quotes are dropped so a description is found by its words
+
+    returns
+    -------
+    tokens
+        list representing the tokens of the change
+
+        example format listed below:
+
+        ip route 0.0.0.0/0 192.168.12.1 -> ['ip', 'route', '0.0.0.0/0', '192.168.12.1']
+
+    """
+
+    return ACCOUNTING_TOKEN.findall(change.lower())
+
+def _token_rows(entries):
+    """ token rows
+    builds the rows of the search index for accounting entries
+
+    returns
+    -------
+    token_rows
+        iterator of tuples of token, device, seq and position of the token
+
+    """
+
+    for device, seq, change in entries:
+        for position, token in enumerate(_tokenize_change(change)):
+            yield token, device, seq, position
+
+class AccountingStore:
+    """ accounting store
+    keeps the parsed accounting log of every device in sqlite together with
+    a high water mark, so repeat runs only fetch and parse newer entries """
+
+    def __init__(self, filename):
+        # open the store and create its tables on first use
+        # the timeout lets several devices be stored at the same time
+        self.connection = sqlite3.connect(filename, timeout=30)
+        self.connection.executescript(
+            'CREATE TABLE IF NOT EXISTS accounting_entries ('
+            ' device TEXT, seq INTEGER, timestamp TEXT, user TEXT, path TEXT, change TEXT,'
+            ' PRIMARY KEY (device, seq));'
+            'CREATE TABLE IF NOT EXISTS accounting_marks ('
+            ' device TEXT PRIMARY KEY, timestamp TEXT, count INTEGER, seq INTEGER);'
+            'CREATE TABLE IF NOT EXISTS accounting_tokens ('
+            ' token TEXT, device TEXT, seq INTEGER, position INTEGER,'
+            ' PRIMARY KEY (token, device, seq, position)) WITHOUT ROWID;'
+            'CREATE INDEX IF NOT EXISTS accounting_entries_user ON accounting_entries (user, timestamp);'
+            'CREATE INDEX IF NOT EXISTS accounting_entries_timestamp ON accounting_entries (timestamp);')
+        self.connection.commit()
+
+    def high_water_mark(self, device):
+        """ high water mark
+        the newest entry stored for the device
+
+        returns
+        -------
+        high_water_mark
+            tuple representing the timestamp of the newest entry and the number
+            of entries stored with that timestamp, or None for a new device
+
+        """
+
+        row = self.connection.execute(
+            'SELECT timestamp, count FROM accounting_marks WHERE device = ?', (device,)).fetchone()
+
+        return row
+
+    def ingest(self, device, entries):
+        """ ingest
+        stores the entries that are newer than the high water mark
+        entries from the second of the high water mark are fetched again
+        by start-time, so as many as were already stored are skipped
+
+        returns
+        -------
+        new_entries
+            int variable representing the number of entries stored
+
+        """
+
+        # initialize the high water mark of the device
+        row = self.connection.execute(
+            'SELECT timestamp, count, seq FROM accounting_marks WHERE device = ?', (device,)).fetchone()
+        mark_timestamp, mark_count, seq = row if row else ('', 0, 0)
+
+        # initialize the rows to insert
+        rows = []
+        skip = mark_count
+        new_entries = 0
+
+        # iterate through the entries in the order they were logged
+        for timestamp, user, path in entries:
+            # skip entries that are already stored
+            if timestamp < mark_timestamp:
+                continue
+            if timestamp == mark_timestamp and skip:
+                skip -= 1
+                continue
+
+            seq += 1
+            # the path is stored one line per parent, the change is kept on its own
+            # for the search index
+            rows.append((device, seq, timestamp, user, '\n'.join(path), path[-1]))
+
+            # move the high water mark along
+            if timestamp == mark_timestamp:
+                mark_count += 1
+            else:
+                mark_timestamp, mark_count = timestamp, 1
+
+            # store a full batch, the high water mark moves along with it
+            if len(rows) >= ACCOUNTING_BATCH_SIZE:
+                self._store_rows(rows, (device, mark_timestamp, mark_count, seq))
+                new_entries += len(rows)
+                rows = []
+
+        # store the remaining entries
+        if rows:
+            self._store_rows(rows, (device, mark_timestamp, mark_count, seq))
+            new_entries += len(rows)
+
+        return new_entries
+
+    def _store_rows(self, rows, mark):
+        """ store rows
+        stores a batch of entries, their tokens and the high water mark
+        in a single transaction """
+
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO accounting_entries VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+            # index the tokens of the new entries in the same transaction
+            self.connection.executemany(
+                'INSERT INTO accounting_tokens VALUES (?, ?, ?, ?)',
+                _token_rows((device, seq, change) for device, seq, timestamp, user, path, change in rows))
+            self.connection.execute(
+                'INSERT OR REPLACE INTO accounting_marks VALUES (?, ?, ?, ?)', mark)
+
+    def entries(self, device):
+        """ entries
+        every stored entry of the device in the order they were logged
+
+        returns
+        -------
+        entries
+            iterator of tuples of timestamp, user and path
+
+        """
+
+        rows = self.connection.execute(
+            'SELECT timestamp, user, path FROM accounting_entries'
+            ' WHERE device = ? ORDER BY seq', (device,))
+
+        for timestamp, user, path in rows:
+            yield timestamp, user, tuple(path.split('\n'))
+
+    def close(self):
+        """ close
+        closes the store """
+
+        self.connection.close()
+
+def _stream_command_output(net_connect, command, read_timeout=ACCOUNTING_READ_TIMEOUT):
+    """ stream command output
+    sends a command over the ssh channel and yields its output line by line
+    as it arrives, instead of buffering the whole output like send_command
+    so a long output is parsed while it is still being transferred
+
+    returns
+    -------
+    lines
+        iterator of str variables representing the lines of the output
+
+    """
+
+    # the output is complete once the prompt is back
+    prompt = net_connect.find_prompt()
+
+    # send the command
+    net_connect.write_channel(command + net_connect.RETURN)
+
+    # initialize the partial line that has not been completed yet
+    partial_line = ''
+    last_read = time.time()
+
+    # keep reading till the prompt is back
+    while True:
+        output = net_connect.read_channel()
+
+        # wait for more output unless the device stopped responding
+        if not output:
+            if time.time() - last_read > read_timeout:
+                raise IOError(f"No output from '{command}' for {read_timeout} seconds")
+            time.sleep(0.05)
+            continue
+        last_read = time.time()
+
+        # yield every completed line, only the partial line is kept
+        lines = (partial_line + output).replace('\r', '').split('\n')
+        partial_line = lines.pop()
+        yield from lines
+
+        # the last partial line is the prompt once the command is done
+        if partial_line.strip().endswith(prompt):
+            return
+
+def _accounting_log_command(high_water_mark):
+    """ accounting log command
+    builds the show accounting log command that fetches the entries
+    from the high water mark onwards, or all entries for a new device
+
+    returns
+    -------
+    command
+        str variable representing the show accounting log command
+
+        example format listed below:
+
+        show accounting log start-time 2020 Feb 10 09:30:45
+
+    """
+
+    # a new device needs the whole log
+    if high_water_mark is None:
+        return 'show accounting log all'
+
+    # convert the timestamp to the start-time format of nx-os
+    timestamp = datetime.datetime.strptime(high_water_mark[0], '%Y-%m-%d %H:%M:%S')
+
+    return 'show accounting log start-time ' + timestamp.strftime('%Y %b %d %H:%M:%S')
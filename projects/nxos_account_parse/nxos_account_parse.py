@@ -14,8 +14,9 @@ import getpass
 # import the csv library
 import csv
 
-# import datetime
-import datetime
+# import the accounting log parser and store shared with nxos blame
+from accounting_store import (AccountingStore, _iter_accounting_entries,
+                              _stream_command_output, _accounting_log_command)
 
 # initialize colorama globally
 # required for windows and optional for other systems
@@ -71,9 +72,9 @@ def _get_user_credentials():
         # return the username and password
         return username, password, secret
 
-def _parse_show_accounting_log(device_output):
+def _parse_show_accounting_log(entries):
     """ parse show accounting log
-    helper function with the parsing logic for the show accounting log command
+    groups the accounting entries by date and user
 
     returns
     -------
@@ -89,43 +90,13 @@ def _parse_show_accounting_log(device_output):
     # initialize parsed data
     parsed_data = {}
 
-    # iterate through the device output
-    for line in device_output.splitlines():
-        # skip if this was not a configuration update
-        if 'configure' not in line:
-            continue
-        # skip if the configuration is not defined as success
-        elif not line.strip().endswith('(SUCCESS)'):
-            continue
-
-        # remove the success tag of the line
-        line = line.replace('(SUCCESS)', '')
-
-        # cisco date format
-        # this is the way cisco format's their date in the command
-        cisco_date_format = '%a %b %d %H:%M:%S %Y:'
-
-        # date of change date format
-        date_of_change_date_format = '%Y-%m-%d'
-
-        # determine date of change
-        raw_date_from_line = line.split('type')[0]
-
-        # convert raw date from show command to a datetime object
-        date_object = datetime.datetime.strptime(raw_date_from_line, cisco_date_format)
+    # iterate through the accounting entries
+    for timestamp, user, path in entries:
+        # the date of change is the date part of the timestamp
+        date_of_change = timestamp[:10]
 
-        # convert datetime object to a string in the date of change date format
-        date_of_change = date_object.strftime(date_of_change_date_format)
-
-        # grab user from the line
-        user = line.split(':')[-2].split('=')[-1]
-
-        # grab change from the line
-        change = line.split(';')[-1].strip()
-
-        # for formatting, add spaces to command based off ';' in line
-        number_of_spaces = line.count(';') - 1
-        change = number_of_spaces*' ' + change
+        # for formatting, add a space to the change for every parent line
+        change = (len(path) - 1)*' ' + path[-1]
 
         # initialize parsed data with date of change
         if date_of_change not in parsed_data:
@@ -192,6 +163,9 @@ def nxos_account_parse():
 
         return
 
+    # open the accounting store so only new entries are fetched
+    accounting_store = AccountingStore('accounting.db')
+
     # keep running till user decides to exit out
     while True:
         # ask user for a nexus switch dns or ip
@@ -230,26 +204,35 @@ def nxos_account_parse():
             break
 
         # initialize show account log command
-        command = 'show accounting log all'
+        # only the entries since the last run are fetched
+        command = _accounting_log_command(accounting_store.high_water_mark(device))
 
-        # capture device output from show command
-        usr_msg = "\nRunning 'show accounting log all'"
+        # capture and parse device output from show command as it arrives
+        # the new entries are stored in batches while the output is transferred
+        usr_msg = "\nRunning and parsing '" + command + "'"
         print(colorama.Fore.CYAN + usr_msg)
-        device_output = net_connect.send_command(command)
+        try:
+            accounting_log_lines = _stream_command_output(net_connect, command)
+            new_entries = accounting_store.ingest(device, _iter_accounting_entries(accounting_log_lines))
 
         # disconnect from the nexus switch
-        net_connect.disconnect()
+        finally:
+            net_connect.disconnect()
 
-        # parse the device output
-        usr_msg = "\nParsing 'show accounting log all'"
+        usr_msg = "\n" + str(new_entries) + " new change(s) since the last run"
         print(colorama.Fore.CYAN + usr_msg)
-        parsed_data = _parse_show_accounting_log(device_output)
+
+        # group the whole history of the device
+        parsed_data = _parse_show_accounting_log(accounting_store.entries(device))
 
         # write parsed data to csv
         usr_msg = f"\nSaving parsed data to '{device.lower()}.csv'"
         print(colorama.Fore.CYAN + usr_msg)
         _save_parsed_data_to_csv(device, parsed_data)
 
+    # close the accounting store
+    accounting_store.close()
+
     usr_msg = "\nExiting Parse Script.\n"
     print(colorama.Fore.MAGENTA + usr_msg)
 
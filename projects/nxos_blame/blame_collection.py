@@ -0,0 +1,401 @@
+""" blame collection
+collects the accounting log and running configuration of cisco nexus switches
+and ties every configuration line to the user that modified it
+this has no gui so both nxos blame and the nxos blame batch use it """
+
+# import connection library
+import netmiko
+
+# import hashlib to hash the key of the blame cache
+import hashlib
+
+# import sqlite3 for the blame cache
+import sqlite3
+
+# import json and time for the blame cache
+import json
+import time
+
+# import os and sys to find the accounting store of nxos account parse
+import os
+import sys
+
+# the accounting log parser and store are shared with nxos account parse
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'nxos_account_parse'))
+from accounting_store import (AccountingStore, _iter_accounting_entries,
+                              _stream_command_output, _accounting_log_command)
+
+# number of blamed configurations kept in the blame cache by default
+# the batch sizes the cache from its devices file so a whole fleet fits
+BLAME_CACHE_SIZE = 1000
+
+# version of the blame logic, bumping it invalidates the blame cache
+BLAME_CACHE_VERSION = 2
+
+class BlameCache:
+    """ blame cache
+    keeps the blamed configuration of every device in sqlite, keyed by a hash
+    of what it was blamed from, so an unchanged device is not blamed again
+    the least recently used results are evicted once the cache is full """
+
+    def __init__(self, filename, max_entries=BLAME_CACHE_SIZE):
+        # initialize the number of results kept
+        self.max_entries = max_entries
+
+        # open the cache and create its table on first use
+        # the timeout lets several devices be cached at the same time
+        self.connection = sqlite3.connect(filename, timeout=30)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS blame_cache ('
+            ' content_hash TEXT PRIMARY KEY, last_used REAL, comparison TEXT)')
+        self.connection.commit()
+
+    def get(self, content_hash):
+        """ get
+        looks up the blamed configuration of a content hash
+
+        returns
+        -------
+        comparison
+            list representing the blamed configuration, see _compare_run_with_account
+            or None if it is not cached
+
+        """
+
+        row = self.connection.execute(
+            'SELECT comparison FROM blame_cache WHERE content_hash = ?', (content_hash,)).fetchone()
+
+        if row is None:
+            return None
+
+        # mark the result as recently used
+        with self.connection:
+            self.connection.execute(
+                'UPDATE blame_cache SET last_used = ? WHERE content_hash = ?', (time.time(), content_hash))
+
+        return json.loads(row[0])
+
+    def put(self, content_hash, comparison):
+        """ put
+        stores the blamed configuration of a content hash and evicts
+        the least recently used results beyond the size of the cache """
+
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO blame_cache VALUES (?, ?, ?)',
+                (content_hash, time.time(), json.dumps(comparison)))
+            self.connection.execute(
+                'DELETE FROM blame_cache WHERE content_hash NOT IN ('
+                ' SELECT content_hash FROM blame_cache ORDER BY last_used DESC LIMIT ?)',
+                (self.max_entries,))
+
+    def close(self):
+        """ close
+        closes the cache """
+
+        self.connection.close()
+
+def _blame_cache_key(device, run_output, high_water_mark):
+    """ blame cache key
+    hashes everything the blame of a device is built from
+    the stored accounting log only ever grows, so its high water mark
+    identifies the whole history of the device
+
+    returns
+    -------
+    content_hash
+        str variable representing the sha256 hex digest
+
+    """
+
+    content = hashlib.sha256()
+    content.update(f'{BLAME_CACHE_VERSION}|{device}|{high_water_mark}|'.encode())
+    content.update(run_output.encode())
+
+    return content.hexdigest()
+
+
+class ConfigNode:
+    """ config node
+    a line of show run with the lines nested under it """
+
+    __slots__ = ('line', 'children')
+
+    def __init__(self, line, children):
+        # initialize the line and the nested lines
+        self.line = line
+        self.children = children
+
+def _build_config_tree(run_output):
+    """ build config tree
+    parses show run into a tree of sections based on the leading spaces
+    of every line, so sections nested at any depth keep their parents
+
+    returns
+    -------
+    root
+        ConfigNode representing the whole configuration
+    paths
+        list representing the path of every line of show run in order
+        a path is a tuple of the stripped lines from the top level section down
+
+        example format listed below:
+
+        [ ('hostname nexus',), ('router bgp 65000',), ('router bgp 65000', 'neighbor 10.0.0.1') ]
+
+    """
+
+    # initialize the path of every line
+    paths = []
+
+    # initialize the open sections with the root
+    # every open section is the leading spaces, the line and its nested nodes
+    open_sections = [(-1, '', [])]
+
+    # iterate through the run output
+    for line in run_output.splitlines():
+        # figure out the depth of the line from its leading spaces
+        leading_spaces = len(line) - len(line.lstrip(' '))
+        line = line.strip()
+
+        # close every section the line is not nested under
+        while open_sections[-1][0] >= leading_spaces:
+            _, section_line, children = open_sections.pop()
+            open_sections[-1][2].append(ConfigNode(section_line, tuple(children)))
+
+        # the path of the line is the line of every open section and the line itself
+        paths.append(tuple(section[1] for section in open_sections[1:]) + (line,))
+
+        # the line is a section of its own until a line is not nested under it
+        open_sections.append((leading_spaces, line, []))
+
+    # close the remaining sections
+    while len(open_sections) > 1:
+        _, section_line, children = open_sections.pop()
+        open_sections[-1][2].append(ConfigNode(section_line, tuple(children)))
+
+    return ConfigNode('', tuple(open_sections[0][2])), paths
+
+def _index_accounting_changes(entries):
+    """ index accounting changes
+    walks the accounting entries once in the order they were logged and keeps
+    the latest change of every configuration line under its full path
+    the path of every entry comes straight from its own accounting log line
+
+    returns
+    -------
+    change_index
+        dict representing the latest change of every configuration line
+        keyed by the path of the configuration line
+
+        example format listed below:
+
+        {
+            ('interface loopback100', 'description test'): ('2020-01-20 10:00:00', 'ethan'),
+            ('hostname nexus',): ('2020-01-20 09:00:00', 'frank')
+        }
+
+    """
+
+    # initialize change index
+    change_index = {}
+
+    # iterate through the entries from the oldest
+    # example: ('interface loopback100', 'description test')
+    for timestamp, user, path in entries:
+        # a later change of the same line overwrites the earlier one
+        change_index[path] = (timestamp, user)
+
+    return change_index
+
+def _blame_config_tree(node, change_index, path, config_blame):
+    """ blame config tree
+    blames every line under a section and rolls the blame of the nested
+    lines up to their sections, so a section knows the last change made
+    anywhere under it
+
+    returns
+    -------
+    section_blame
+        tuple representing the timestamp and user of the latest change
+        of the section, None if no change is known
+
+    """
+
+    # initialize the section blame with the change of the line itself
+    section_blame = change_index.get(path)
+
+    # iterate through the nested lines
+    for child in node.children:
+        child_blame = _blame_config_tree(child, change_index, path + (child.line,), config_blame)
+
+        # keep the latest change of the section
+        if child_blame is not None and (section_blame is None or child_blame > section_blame):
+            section_blame = child_blame
+
+    # store the blame of the line and its section
+    config_blame[path] = (change_index.get(path), section_blame)
+
+    return section_blame
+
+def _compare_run_with_account(run_output, entries):
+    """ compare run with account
+    takes the show run output and compares with the accounting log
+    to tie the configuration together with the user that modified it
+    show run is parsed into a tree and the accounting changes are indexed
+    by path, so every line of show run is a single lookup
+
+    returns
+    -------
+    comparison
+        list representing what was modified in show run
+        which includes the following - user that modified and date
+        lines with nested lines also include the last change of the section
+        each entry in list will be a dictionary
+
+        example format listed below:
+
+        [
+            { 'hostname nexus': { 'user': 'ethan', 'date': '2020-01-20' } },
+            { 'interface loopback100': { 'user': 'frank', 'date': '2020-01-20',
+                                         'section_user': 'ethan', 'section_date': '2020-02-03' } },
+            { '  description test': { 'user': 'ethan', 'date': '2020-02-03' } }
+        ]
+
+    """
+
+    # index the latest change of every configuration line
+    change_index = _index_accounting_changes(entries)
+
+    # parse show run into a tree and blame every line of it
+    root, paths = _build_config_tree(run_output)
+    config_blame = {}
+    for child in root.children:
+        _blame_config_tree(child, change_index, (child.line,), config_blame)
+
+    # initialize comparison
+    comparison = []
+
+    # iterate through the run output
+    for line, path in zip(run_output.splitlines(), paths):
+        line_blame, section_blame = config_blame[path]
+
+        # store the configuration with no one to blame if there is none
+        if line_blame is None:
+            blame = {'user': 'unknown', 'date': '???'}
+        else:
+            blame = {'user': line_blame[1], 'date': line_blame[0][:10]}
+
+        # sections also show the last change made anywhere under them
+        # unless it was made by the same user on the same date as the line
+        if section_blame is not None and section_blame != line_blame:
+            section_user, section_date = section_blame[1], section_blame[0][:10]
+            if (section_user, section_date) != (blame['user'], blame['date']):
+                blame['section_user'] = section_user
+                blame['section_date'] = section_date
+
+        comparison.append({line: blame})
+
+    return comparison
+
+def _blame_device(device, username, password, progress, cache_size=BLAME_CACHE_SIZE):
+    """ blame device
+    collects the accounting log and running configuration of a nexus switch
+    and ties every configuration line to the user that modified it
+    this runs inside a worker thread so progress is reported through a callback
+    cache_size is the number of blamed configurations the blame cache keeps
+
+    returns
+    -------
+    comparison
+        list representing what was modified in show run, see _compare_run_with_account
+
+    """
+
+    # build netmiko device profile
+    network_device_profile = {
+        'device_type': 'cisco_nxos',
+        'ip': device,
+        'username': username,
+        'password': password,
+        'secret': password,
+    }
+
+    # initialize the connection handler of netmiko
+    usr_msg = "<br><span style=\" font-size:12pt; font-weight:600; color:#0F52BA;\" >"
+    usr_msg += f"Connecting to {device.lower()}"
+    usr_msg += "</span>"
+    progress(usr_msg)
+    net_connect = netmiko.ConnectHandler(**network_device_profile)
+
+    # open the accounting store so only new entries are fetched
+    # every worker opens its own connection to the store
+    accounting_store = AccountingStore('accounting.db')
+
+    # disconnect from the nexus switch even if a command failed
+    try:
+        # initialize show account log command
+        # only the entries since the last run are fetched
+        command = _accounting_log_command(accounting_store.high_water_mark(device))
+
+        # capture and parse device output from show command as it arrives
+        # the new entries are stored in batches while the output is transferred
+        usr_msg = "<i><span style=\" font-size:12pt;\" >"
+        usr_msg += f"...Running and parsing '{command}' on {device.lower()}"
+        usr_msg += "</span></i>"
+        progress(usr_msg)
+        accounting_log_lines = _stream_command_output(net_connect, command)
+        accounting_store.ingest(device, _iter_accounting_entries(accounting_log_lines))
+
+        # initialize show run command
+        command = 'show run'
+
+        # capture device output from show command
+        usr_msg = "<i><span style=\" font-size:12pt;\" >"
+        usr_msg += f"...Running 'show run' on {device.lower()}"
+        usr_msg += "</span></i>"
+        progress(usr_msg)
+        run_output = net_connect.send_command(command)
+
+    # the accounting store is not needed if the device could not be collected
+    except Exception:
+        accounting_store.close()
+        raise
+
+    finally:
+        net_connect.disconnect()
+
+    try:
+        # an unchanged device is loaded from the blame cache
+        content_hash = _blame_cache_key(device, run_output, accounting_store.high_water_mark(device))
+        blame_cache = BlameCache('blame_cache.db', cache_size)
+
+        try:
+            comparison = blame_cache.get(content_hash)
+            if comparison is not None:
+                usr_msg = "<i><span style=\" font-size:12pt;\" >"
+                usr_msg += f"...Nothing changed on {device.lower()}, loaded its blame from the cache"
+                usr_msg += "</span></i>"
+                progress(usr_msg)
+
+                return comparison
+
+            # compare the device output with the whole history of the device
+            usr_msg = "<i><span style=\" font-size:12pt;\" >"
+            usr_msg += f"...Compare 'show accounting log all' with 'show run' of {device.lower()}"
+            usr_msg += "</span></i>"
+            progress(usr_msg)
+            comparison = _compare_run_with_account(run_output, accounting_store.entries(device))
+
+            # store the blame for the next run
+            blame_cache.put(content_hash, comparison)
+
+            return comparison
+
+        # close the blame cache
+        finally:
+            blame_cache.close()
+
+    # close the accounting store
+    finally:
+        accounting_store.close()
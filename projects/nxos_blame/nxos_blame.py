@@ -8,15 +8,121 @@ from PySide2 import QtWidgets, QtGui, QtCore
 # import sys to exit application
 import sys
 
-# import connection library
-import netmiko
-
-# import datetime for parsing purposes
-import datetime
+# import the collection and blame logic, which has no gui of its own
+from blame_collection import _blame_device
 
 # import sockets library for dns lookups
 import socket
 
+# import heapq to find the longest configuration lines
+import heapq
+
+class BlameWorkerSignals(QtCore.QObject):
+    """ blame worker signals
+    signals of a blame worker, qrunnable cannot emit signals itself
+    signals emitted from the worker thread are delivered on the gui thread """
+
+    # progress message to append to the during display
+    progress = QtCore.Signal(str)
+
+    # device and its comparison once the device is blamed
+    finished = QtCore.Signal(str, object)
+
+    # device and the error if the device could not be blamed
+    failed = QtCore.Signal(str, str)
+
+class BlameWorker(QtCore.QRunnable):
+    """ blame worker
+    collects and blames a single device on the thread pool """
+
+    def __init__(self, device, username, password):
+        # inherit properties from QRunnable
+        super().__init__()
+
+        # initialize the device and credentials
+        self.device = device
+        self.username = username
+        self.password = password
+
+        # initialize the signals of the worker
+        self.signals = BlameWorkerSignals()
+
+    def run(self):
+        """ run
+        blames the device and reports the result through the signals """
+
+        try:
+            comparison = _blame_device(self.device, self.username, self.password,
+                                       self.signals.progress.emit)
+
+        # report the error instead of losing it on the worker thread
+        except Exception as error:
+            self.signals.failed.emit(self.device, str(error))
+
+        else:
+            self.signals.finished.emit(self.device, comparison)
+
+class BlameModel(QtCore.QAbstractListModel):
+    """ blame model
+    serves the blamed configuration of a device to the blame display
+    the view only asks for the rows that are visible, so a configuration
+    of any size is shown instantly """
+
+    def __init__(self):
+        # inherit properties from QAbstractListModel
+        super().__init__()
+
+        # initialize the comparison of the selected device
+        self.comparison = []
+
+    def set_comparison(self, comparison):
+        """ set comparison
+        replaces the configuration shown by the blame display """
+
+        self.beginResetModel()
+        self.comparison = comparison
+        self.endResetModel()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        """ row count
+        number of configuration lines of the selected device """
+
+        # a list model has no children
+        if parent.isValid():
+            return 0
+
+        return len(self.comparison)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        """ data
+        text of a configuration line when the view draws it """
+
+        if not index.isValid() or role != QtCore.Qt.DisplayRole:
+            return None
+
+        # initialize the line
+        line = next(iter(self.comparison[index.row()]))
+
+        # just show "!" for empty spaces
+        # this is mostly just for formatting reasons
+        if not line.strip():
+            return "!"
+
+        return line
+
+    def blame(self, row):
+        """ blame
+        user and date that modified a configuration line
+
+        returns
+        -------
+        blame
+            dict representing the user and the date, see _compare_run_with_account
+
+        """
+
+        return next(iter(self.comparison[row].values()))
+
 class NXOSBlame(QtWidgets.QDialog):
 
     def __init__(self):
@@ -63,6 +169,11 @@ class NXOSBlame(QtWidgets.QDialog):
         # initialize the final result dataset
         self.final_result = {}
 
+        # initialize the thread pool that collects the devices
+        # the number of concurrent sessions is kept small for the switches' sake
+        self.thread_pool = QtCore.QThreadPool()
+        self.thread_pool.setMaxThreadCount(8)
+
     def center_application(self):
         """ center application
         centers the application to the user's screen """
@@ -161,8 +272,16 @@ class NXOSBlame(QtWidgets.QDialog):
         self.device_selection.itemSelectionChanged.connect(self.select_device)
 
         # blame display
-        self.blame_display = QtWidgets.QListWidget()
-        self.blame_display.itemSelectionChanged.connect(self.show_blame)
+        # the rows all have the same height so the view never measures them
+        self.blame_model = BlameModel()
+        self.blame_display = QtWidgets.QListView()
+        self.blame_display.setUniformItemSizes(True)
+        self.blame_display.setModel(self.blame_model)
+        self.blame_display.selectionModel().currentChanged.connect(self.show_blame)
+
+        # initialize the widest line of every device
+        # this is only measured the first time a device is selected
+        self.widest_line = {}
 
         # user details
         self.user_details = QtWidgets.QLineEdit()
@@ -182,8 +301,9 @@ class NXOSBlame(QtWidgets.QDialog):
         self.password = self.password_field.text()
 
         # initialize the devices
+        # empty lines and duplicates are skipped as every device gets its own worker
         raw_device_data = self.network_devices_field.toPlainText().splitlines()
-        self.devices = [device.strip() for device in raw_device_data]
+        self.devices = list(dict.fromkeys(device.strip() for device in raw_device_data if device.strip()))
 
         # initialize the width of the screen
         # this will modify the entire screen real estate based on configuration
@@ -194,15 +314,9 @@ class NXOSBlame(QtWidgets.QDialog):
         self.during_screen_frame.show()
 
         # run the nxos parse logic
+        # the after screen is shown once the workers are done
         self.nxos_account_parse()
 
-        # build device selection
-        self.build_device_selection()
-
-        # display the after screen & hide during screen
-        self.during_screen_frame.hide()
-        self.after_screen_frame.show()
-
     def build_device_selection(self):
         """ build device selection
         builds the device selection for the after display """
@@ -229,253 +343,94 @@ class NXOSBlame(QtWidgets.QDialog):
 
     def update_during_display(self, usr_msg):
         """ update during display
-        as displays are not generally updated dynamically
         this method ensures that the during display is updated while
-        progress is being made to inform the user of what is going on """
+        progress is being made to inform the user of what is going on
+        the workers call it through their progress signal on the gui thread """
 
         # append the message to the during display
         self.during_display.append(usr_msg)
 
-        # call the application to process the events
-        # this is necessary to update the screen as progress is being made
-        QtWidgets.QApplication.processEvents()
-
-    def _parse_show_accounting_log(self, accounting_log_output):
-        """ parse show accounting log
-        helper function with the parsing logic for the show accounting log command
-
-        returns
-        -------
-        parsed_accounting_data
-            dict representing the parsed data of show accounting log
-            will contain the date as key and user->[config] data as values
-
-            example format listed below:
-
-            { '2019-01-01': { 'admin': [ config_lines ] } }
-
-        """
-        # initialize parsed accounting data
-        parsed_accounting_data = {}
-
-        # iterate through the device output
-        for line in accounting_log_output.splitlines():
-            # skip if this was not a configuration update
-            if 'configure' not in line:
-                continue
-            # skip if the configuration is not defined as success
-            elif not line.strip().endswith('(SUCCESS)'):
-                continue
-
-            # remove the success tag of the line
-            line = line.replace('(SUCCESS)', '')
-
-            # cisco date format
-            # this is the way cisco format's their date in the command
-            cisco_date_format = '%a %b %d %H:%M:%S %Y:'
-
-            # date of change date format
-            date_of_change_date_format = '%Y-%m-%d'
-
-            # determine date of change
-            raw_date_from_line = line.split('type')[0]
-
-            # convert raw date from show command to a datetime object
-            date_object = datetime.datetime.strptime(raw_date_from_line, cisco_date_format)
-
-            # convert datetime object to a string in the date of change date format
-            date_of_change = date_object.strftime(date_of_change_date_format)
-
-            # grab user from the line
-            user = line.split(':')[-2].split('=')[-1]
+    def nxos_account_parse(self):
+        """ nxos account parse
+        parses the accounting information on cisco nexus switches
+        every device is collected and blamed by a worker on the thread pool
+        so the gui stays responsive and devices are processed concurrently """
 
-            # grab change from the line
-            change = line.split(';')[-1].strip()
+        # introduction message to the user
+        usr_msg = "<span style=\" font-size:14pt; font-weight:600; color:#410056;\" >"
+        usr_msg += "NXOS Blame - Collect & Parse"
+        usr_msg += "</span>"
 
-            # for formatting, add spaces to command based off ';' in line
-            number_of_spaces = line.count(';') - 1
-            change = 2*number_of_spaces*' ' + change
+        # set the during display text
+        self.during_display.setText(usr_msg)
 
-            # initialize parsed data with date of change
-            if date_of_change not in parsed_accounting_data:
-                parsed_accounting_data[date_of_change] = {}
-            # initialize parsed data with user
-            if user not in parsed_accounting_data[date_of_change]:
-                parsed_accounting_data[date_of_change][user] = []
+        # initialize the devices that are still being blamed
+        self.pending_devices = set(self.devices)
 
-            # add change the user did that day to the parsed data
-            parsed_accounting_data[date_of_change][user].append(change)
+        # nothing to collect if no devices were provided
+        if not self.pending_devices:
+            self.show_results()
+            return
 
-        return parsed_accounting_data
+        # iterate through the devices
+        for device in self.devices:
+            # initialize the worker of the device
+            worker = BlameWorker(device, self.username, self.password)
+            worker.signals.progress.connect(self.update_during_display)
+            worker.signals.finished.connect(self.device_blamed)
+            worker.signals.failed.connect(self.device_failed)
 
-    def _compare_run_with_account(self, run_output, parsed_accounting_data):
-        """ compare run with account
-        takes the show run output and compares with the accounting log
-        to tie the configuration together with the user that modified it
+            # hand the worker to the thread pool
+            self.thread_pool.start(worker)
 
-        returns
-        -------
-        comparison
-            list representing what was modified in show run
-            which includes the following - user that modified and date
-            each entry in list will be a dictionary
+    def device_blamed(self, device, comparison):
+        """ device blamed
+        a worker has finished blaming a device """
 
-            example format listed below:
+        # build final result dataset
+        self.final_result[device] = comparison
 
-            [
-                { 'hostname nexus': { 'user': 'ethan', 'date': '2020-01-20' } },
-                { 'enable secret *': { 'user': 'frank', 'date': '2020-01-20' } }
-            ]
+        # move on once every device is done
+        self.device_done(device)
 
-        """
+    def device_failed(self, device, error):
+        """ device failed
+        a worker could not blame a device """
 
-        # initialize comparison
-        comparison = []
-        parent_run_line = ''
-        parent_change_line = ''
-
-        # iterate through the run output
-        for line in run_output.splitlines():
-            # initialize flag for when a change is detected in show run
-            found_change_in_data = False
-
-            # figure out what the parent line of the current line is
-            # example: interface loopback100 is parent of description test
-            # this is important in case there are duplicate configuration
-            # in order to differentiate between who did which configuration
-            # we must know the parent line of the configuration
-            leading_spaces_of_line = len(line) - len(line.lstrip(' '))
-            leading_spaces_of_parent_run_line = len(parent_run_line) - len(parent_run_line.lstrip(' '))
-
-            # update the parent run line
-            if leading_spaces_of_line <= leading_spaces_of_parent_run_line:
-                parent_run_line = line
-
-            # iterate through the parsed accounting data
-            for date_of_change, user_info in reversed(sorted(parsed_accounting_data.items())):
-                # iterate through the user info
-                for user, changes in user_info.items():
-                    # iterate through the changes
-                    for change in changes:
-
-                        # this specific logic is to figure out the parent line of the
-                        # configuration from the changes performed that were
-                        # captured in the accounting show command
-                        leading_spaces_of_change = len(change) - len(change.lstrip(' '))
-                        leading_spaces_of_parent_change = len(parent_change_line) - len(parent_change_line.lstrip(' '))
-
-                        # update the parent change line
-                        if leading_spaces_of_change <= leading_spaces_of_parent_change:
-                            parent_change_line = change
-
-                        # check if change is equal to the line
-                        if line == change:
-                            # if the parent of the run and change are the same
-                            if parent_run_line == parent_change_line:
-                                # add to comparison
-                                data = {line: {'user': user, 'date': date_of_change}}
-                                comparison.append(data)
-                                # set flag to true
-                                found_change_in_data = True
-                                break
-
-                        # chain the breaks
-                        if found_change_in_data:
-                            break
-
-                    # chain the breaks
-                    if found_change_in_data:
-                        break
-
-                # chain the breaks
-                if found_change_in_data:
-                    break
-
-            # store the configuration with no one to blame
-            if not found_change_in_data:
-                data = {line: {'user': 'unknown', 'date': '???'}}
-                comparison.append(data)
-
-        return comparison
+        # inform the user of the failure
+        usr_msg = "<br><span style=\" font-size:12pt; font-weight:600; color:#B22222;\" >"
+        usr_msg += f"Failed to collect {device.lower()}: {error}"
+        usr_msg += "</span>"
+        self.update_during_display(usr_msg)
 
-    def nxos_account_parse(self):
-        """ nxos account parse
-        parses the accounting information on cisco nexus switches """
+        # move on once every device is done
+        self.device_done(device)
 
-        # introduction message to the user
-        usr_msg = "<span style=\" font-size:14pt; font-weight:600; color:#410056;\" >"
-        usr_msg += "NXOS Blame - Collect & Parse"
-        usr_msg += "</span>"
+    def device_done(self, device):
+        """ device done
+        shows the results once the last device is done """
 
-        # set the during display text and process events
-        self.during_display.setText(usr_msg)
-        QtWidgets.QApplication.processEvents()
+        # remove the device from the devices that are still being blamed
+        self.pending_devices.discard(device)
 
-        # initialize parsed data
-        parsed_data = {}
+        if not self.pending_devices:
+            self.show_results()
 
-        # iterate through the devices
-        for device in self.devices:
-            # build netmiko device profile
-            network_device_profile = {
-                'device_type': 'cisco_nxos',
-                'ip': device,
-                'username': self.username,
-                'password': self.password,
-                'secret': self.password,
-            }
-
-            # initialize the connection handler of netmiko
-            usr_msg = "<br><span style=\" font-size:12pt; font-weight:600; color:#0F52BA;\" >"
-            usr_msg += f"Connecting to {device.lower()}"
-            usr_msg += "</span>"
-            self.update_during_display(usr_msg)
-            net_connect = netmiko.ConnectHandler(**network_device_profile)
-
-            # initialize show account log command
-            command = 'show accounting log all'
-
-            # capture device output from show command
-            usr_msg = "<i><span style=\" font-size:12pt;\" >"
-            usr_msg += "...Running 'show accounting log all'"
-            usr_msg += "</span></i>"
-            self.update_during_display(usr_msg)
-            accounting_log_output = net_connect.send_command(command)
-
-            # parse the device output
-            usr_msg = "<i><span style=\" font-size:12pt;\" >"
-            usr_msg += "...Parsing 'show accounting log all'"
-            usr_msg += "</span></i>"
-            self.update_during_display(usr_msg)
-            parsed_accounting_data = self._parse_show_accounting_log(accounting_log_output)
-
-            # initialize show run command
-            command = 'show run'
-
-            # capture device output from show command
-            usr_msg = "<i><span style=\" font-size:12pt;\" >"
-            usr_msg += "...Running 'show run'"
-            usr_msg += "</span></i>"
-            self.update_during_display(usr_msg)
-            run_output = net_connect.send_command(command)
-
-            # parse the device output
-            usr_msg = "<i><span style=\" font-size:12pt;\" >"
-            usr_msg += "...Compare 'show accounting log all' with 'show run'"
-            usr_msg += "</span></i>"
-            self.update_during_display(usr_msg)
-
-            # build final result dataset
-            self.final_result[device] = {}
-            self.final_result[device] = self._compare_run_with_account(run_output, parsed_accounting_data)
-
-            # disconnect from the nexus switch
-            net_connect.disconnect()
+    def show_results(self):
+        """ show results
+        switches from the during screen to the after screen """
 
         # display last message of the during display before the transition to after
         usr_msg = "<br><i>Rendering Results. Please standby...</i>"
         self.update_during_display(usr_msg)
 
+        # build device selection
+        self.build_device_selection()
+
+        # display the after screen & hide during screen
+        self.during_screen_frame.hide()
+        self.after_screen_frame.show()
+
     def select_device(self):
         """ select device
         user selected a device in the after display
@@ -484,64 +439,63 @@ class NXOSBlame(QtWidgets.QDialog):
         # initialize device
         device = self.device_selection.currentItem().text()
 
-        self.blame_display.clear()
+        # clear the blame of the previous device
+        self.user_details.clear()
 
         # check if device is not in final result
         if device not in self.final_result:
-            self.blame_display.addItem('<i>No data found for this device...</i>')
+            self.blame_model.set_comparison([{'No data found for this device...': {'user': 'unknown', 'date': '???'}}])
             return
 
-        # initialize current configuration items
-        # this will be used to keep track of which user did what change
-        # based on the row the chang is on in the list widget
-        self.current_configuration_items = []
-
-        # iterate through the line data from the final results
-        for line_data in self.final_result[device]:
-            # initialize the line, user, date
-            line = list(line_data.keys())[0]
-            user = list(line_data.values())[0]['user']
-            date = list(line_data.values())[0]['date']
-
-            # add the data to the configuration items
-            self.current_configuration_items.append([user, date])
-
-            # add line to the blame display if not empty
-            if line.strip():
-                self.build_config_selection(line)
-            # otherwise just add "!" for empty spaces
-            # this is mostly just for formatting reasons
-            else:
-                self.blame_display.addItem("!")
-
-    def build_config_selection(self, line):
+        # show the blamed configuration of the device
+        self.blame_model.set_comparison(self.final_result[device])
+
+        # resize the blame display to the widest line of the device
+        self.build_config_selection(device)
+
+    def build_config_selection(self, device):
         """ build config selection
-        builds the config selection for the after display """
+        sizes the blame display for the after display
+        only the longest lines are measured and the result is kept per device """
+
+        # measure the widest line the first time the device is selected
+        if device not in self.widest_line:
+            # a line with more characters is almost always wider, so only
+            # the longest lines need their pixel width measured
+            lines = (next(iter(line_data)) for line_data in self.final_result[device])
+            longest_lines = heapq.nlargest(20, lines, key=len)
 
-        # initialize the width of the device selection
-        width = self.blame_display.fontMetrics().boundingRect(line).width()
+            # initialize the width of the widest line
+            font_metrics = self.blame_display.fontMetrics()
+            self.widest_line[device] = max([font_metrics.boundingRect(line).width()
+                                            for line in longest_lines] + [0])
 
         # update the largest width assuming the width is larger
-        if width > self.largest_width:
+        if self.widest_line[device] > self.largest_width:
             # set the largest width accordingly
-            self.largest_width = width
+            self.largest_width = self.widest_line[device]
 
             # update the actual display accordingly
             self.blame_display.setFixedWidth(self.largest_width + 5)
 
-        # add the configuration line to the blame display
-        self.blame_display.addItem(line)
-
-    def show_blame(self):
+    def show_blame(self, current, previous):
         """ show blame
         show who is to blame! """
 
+        # nothing to show if no configuration line is selected
+        if not current.isValid():
+            return
+
         # initialize the user and date based on the row of the configuration selected
-        user = self.current_configuration_items[self.blame_display.currentRow()][0]
-        date = self.current_configuration_items[self.blame_display.currentRow()][1]
+        blame = self.blame_model.blame(current.row())
+        usr_msg = f"Modified by {blame['user']} on {blame['date']}"
+
+        # sections also show the last change made under them
+        if 'section_user' in blame:
+            usr_msg += f", section last modified by {blame['section_user']} on {blame['section_date']}"
 
         # update the widget to display who to blame for this configuration
-        self.user_details.setText(f'Modified by {user} on {date}')
+        self.user_details.setText(usr_msg)
 
 if __name__ == '__main__':
     # create pyside application
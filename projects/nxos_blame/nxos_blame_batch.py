@@ -0,0 +1,177 @@
+""" nxos blame batch
+headless edition of nxos blame
+blames a whole list of cisco nexus switches without the gui and writes
+a json report per device, i.e. to run every night from cron """
+
+# import the collection and blame logic without the gui of nxos blame
+from blame_collection import _blame_device, BLAME_CACHE_SIZE
+
+# import argparse for the command line options
+import argparse
+
+# import thread pool for collecting devices concurrently
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# import input library for passwords
+import getpass
+
+# import json for the reports
+import json
+
+# import os for the report directory and the credentials
+import os
+
+# import sys for the exit code
+import sys
+
+# import datetime for the report timestamp
+import datetime
+
+def _get_arguments():
+    """ get arguments
+    parses the command line options of the batch
+
+    returns
+    -------
+    arguments
+        argparse namespace representing the devices file, report directory,
+        number of workers, blame cache size and username
+
+    """
+
+    parser = argparse.ArgumentParser(description='Blame a list of nexus switches without the gui.')
+    parser.add_argument('devices_file', help='file with one nexus switch per line')
+    parser.add_argument('--reports', default='blame_reports',
+                        help='directory of the json reports (default: blame_reports)')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='number of switches collected at the same time (default: 8)')
+    parser.add_argument('--cache-size', type=int,
+                        help='number of blamed configurations kept in the blame cache '
+                             f'(default: twice the number of devices, at least {BLAME_CACHE_SIZE})')
+    parser.add_argument('--username', default=os.environ.get('NXOS_BLAME_USERNAME'),
+                        help='username, defaults to the NXOS_BLAME_USERNAME environment variable')
+
+    return parser.parse_args()
+
+def _read_devices(devices_file):
+    """ read devices
+    reads the devices file, empty lines, comments and duplicates are skipped
+
+    returns
+    -------
+    devices
+        list representing the devices in the order of the file
+
+    """
+
+    with open(devices_file) as file:
+        devices = (line.split('#')[0].strip() for line in file)
+
+        return list(dict.fromkeys(device for device in devices if device))
+
+def _write_blame_report(report_directory, device, comparison):
+    """ write blame report
+    writes the blamed configuration of a device as compact json
+    every line of show run is a list of the line, user and date
+    sections with a later change under them also have the section user and date
+
+    example format listed below:
+
+    {
+        "device": "nx01",
+        "generated": "2020-02-10 02:00:00",
+        "lines": [
+            ["hostname nx01", "ethan", "2020-01-20"],
+            ["interface loopback100", "frank", "2020-01-20", "ethan", "2020-02-03"],
+            ["  description test", "ethan", "2020-02-03"]
+        ]
+    }
+
+    """
+
+    # initialize the lines of the report
+    lines = []
+    for line_data in comparison:
+        for line, blame in line_data.items():
+            report_line = [line, blame['user'], blame['date']]
+            if 'section_user' in blame:
+                report_line += [blame['section_user'], blame['section_date']]
+            lines.append(report_line)
+
+    report = {
+        'device': device,
+        'generated': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'lines': lines,
+    }
+
+    # write to a temporary file first so a report is never half written
+    report_file = os.path.join(report_directory, device + '.json')
+    with open(report_file + '.tmp', 'w') as file:
+        json.dump(report, file, separators=(',', ':'))
+    os.replace(report_file + '.tmp', report_file)
+
+def nxos_blame_batch():
+    """ main
+    main function that is the catalyst of the script by executing all
+    other functions
+
+    returns
+    -------
+    exit_code
+        int variable representing 0 if every device was blamed, otherwise 1
+
+    """
+
+    # initialize the options and devices
+    arguments = _get_arguments()
+    devices = _read_devices(arguments.devices_file)
+
+    # initialize the credentials
+    # the environment variables are used when running unattended
+    username = arguments.username or input('Username: ').strip()
+    password = os.environ.get('NXOS_BLAME_PASSWORD') or getpass.getpass('Password: ').strip()
+
+    # size the blame cache for the whole fleet so a nightly run does not evict
+    # the results it is about to reuse, with room for the devices of the window
+    cache_size = arguments.cache_size or max(BLAME_CACHE_SIZE, 2 * len(devices))
+
+    # create the report directory
+    os.makedirs(arguments.reports, exist_ok=True)
+
+    print(f'Blaming {len(devices)} device(s) with {arguments.workers} worker(s)...')
+
+    # initialize the devices that could not be blamed
+    failed_devices = []
+
+    # blame the devices concurrently, at most workers sessions at the same time
+    # progress messages of the gui are not needed here
+    with ThreadPoolExecutor(max_workers=arguments.workers) as executor:
+        futures = {executor.submit(_blame_device, device, username, password,
+                                   lambda usr_msg: None, cache_size): device
+                   for device in devices}
+
+        # write the report of every device as soon as it is done
+        for future in as_completed(futures):
+            device = futures[future]
+
+            try:
+                comparison = future.result()
+
+            # a device that cannot be blamed does not stop the others
+            except Exception as error:
+                print(f'{device}: failed - {error}')
+                failed_devices.append(device)
+
+                continue
+
+            _write_blame_report(arguments.reports, device, comparison)
+            print(f'{device}: {len(comparison)} line(s) blamed')
+
+    # summary of the batch
+    print(f'Blamed {len(devices) - len(failed_devices)} of {len(devices)} device(s), '
+          f'reports are in {arguments.reports}')
+
+    return 1 if failed_devices else 0
+
+if __name__ == '__main__':
+    sys.exit(nxos_blame_batch())
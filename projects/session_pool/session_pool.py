@@ -0,0 +1,633 @@
+""" session pool
+keeps authenticated napalm sessions open between script runs so that
+back to back workflows do not have to log into every device again """
+
+# import connection library
+import napalm
+
+# import cli coloring library
+import colorama
+
+# import hashlib to key sessions by their credentials
+import hashlib
+
+# import os and secrets to create the key file of the session pool
+import os
+import secrets
+
+# import threading and time for the idle eviction of sessions
+import threading
+import time
+
+# import json and sqlite3 for the getter cache
+import json
+import sqlite3
+
+# import the manager to serve the session pool to other scripts
+from multiprocessing.managers import BaseManager
+
+# address the session pool listens on
+# only local scripts are able to reach it
+SESSION_POOL_ADDRESS = ('127.0.0.1', 50505)
+
+# key file shared with the scripts that use the session pool
+SESSION_POOL_KEYFILE = os.path.join(os.path.expanduser('~'), '.networkcoder_session_pool.key')
+
+# default number of seconds a getter result stays fresh
+# getters that are not listed are never cached
+GETTER_MAX_AGE = {
+    'get_facts': 86400,
+    'get_environment': 60,
+    'get_lldp_neighbors': 600,
+    'get_lldp_neighbors_detail': 600,
+}
+
+# napalm methods that change the configuration of a device
+# these need a session of their own and are never run over a pooled session
+CONFIGURATION_METHODS = ('load_merge_candidate', 'load_replace_candidate', 'load_template',
+                         'compare_config', 'commit_config', 'discard_config', 'rollback')
+
+# initiate colorama which is required for windows
+# autoreset also allows to clear colorama settings per print statement
+colorama.init(autoreset=True)
+
+def _write_authkey(filename, authkey):
+    """ write authkey
+    writes the key that scripts need to connect to the session pool
+    the key file is only readable by the current user """
+
+    # replace any previous key file
+    if os.path.exists(filename):
+        os.remove(filename)
+
+    # create the key file with owner only permissions
+    keyfile = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(keyfile, 'wb') as fn:
+        fn.write(authkey)
+
+def _read_getter_max_age(filename):
+    """ read getter max age
+    reads the freshness policy of the getter cache from a file
+    every line holds a getter and the number of seconds its result stays fresh
+    getters that are not in the file keep their default
+
+    returns
+    -------
+    getter_max_age
+        dict variable representing the max age in seconds of every cached getter
+
+        example format listed below:
+
+        { 'get_facts': 86400, 'get_environment': 60 }
+
+    """
+
+    # start from the default policy
+    getter_max_age = dict(GETTER_MAX_AGE)
+
+    try:
+        # open a context handler for the file
+        with open(filename, 'r') as user_file:
+            # iterate through the file
+            for line in user_file.read().splitlines():
+                # skip empty lines and lines that start with # as it implies a comment
+                if not line.strip() or line.strip().startswith('#'):
+                    continue
+
+                # example: get_facts, 86400
+                getter, max_age = [field.strip() for field in line.split(',', 1)]
+
+                # a max age of 0 turns the cache off for the getter
+                getter_max_age[getter] = int(max_age)
+
+    # if file was not found - ignore issue as the defaults are used
+    except FileNotFoundError:
+        pass
+
+    return getter_max_age
+
+class GetterCache:
+    """ getter cache
+    keeps the results of napalm getters in sqlite so that a getter is only
+    run against the device once its previous result is older than its max age
+    the cache outlives the session pool so a restart does not empty it """
+
+    def __init__(self, filename, getter_max_age):
+        # freshness policy of every cached getter
+        self.getter_max_age = getter_max_age
+
+        # the session pool serves every script from its own thread
+        self.lock = threading.Lock()
+
+        # open the cache and create its table on first use
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS getter_cache ('
+            ' session_key TEXT, getter TEXT, arguments TEXT, timestamp REAL, result TEXT,'
+            ' PRIMARY KEY (session_key, getter, arguments))')
+        self.connection.commit()
+
+    def _cache_key(self, session_key, getter, args, kwargs):
+        """ cache key
+        builds the key of a getter result
+
+        returns
+        -------
+        cache_key
+            tuple representing the session, getter and arguments as text
+
+        """
+
+        return ('|'.join(session_key), getter,
+                json.dumps([list(args), kwargs or {}], sort_keys=True))
+
+    def get(self, session_key, getter, args, kwargs, max_age=None):
+        """ get
+        looks up a cached getter result that is still fresh
+        the max age of the getter can be tightened by the caller
+
+        returns
+        -------
+        result
+            the cached result or None if there is no fresh result
+
+        """
+
+        # getters without a max age are never cached
+        getter_max_age = self.getter_max_age.get(getter, 0)
+        if max_age is None or max_age > getter_max_age:
+            max_age = getter_max_age
+
+        if max_age <= 0:
+            return None
+
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT result FROM getter_cache WHERE session_key = ? AND getter = ?'
+                ' AND arguments = ? AND timestamp >= ?',
+                self._cache_key(session_key, getter, args, kwargs) + (time.time() - max_age,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return json.loads(row[0])
+
+    def is_fresh(self, session_key):
+        """ is fresh
+        checks whether the session has any fresh result in the cache
+        which means its credentials were accepted by the device recently
+
+        returns
+        -------
+        is_fresh
+            bool variable representing whether a fresh result exists
+
+        """
+
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT getter, MAX(timestamp) FROM getter_cache WHERE session_key = ?'
+                ' GROUP BY getter', ('|'.join(session_key),)).fetchall()
+
+        for getter, timestamp in rows:
+            if timestamp >= time.time() - self.getter_max_age.get(getter, 0):
+                return True
+
+        return False
+
+    def put(self, session_key, getter, args, kwargs, result):
+        """ put
+        stores the result of a getter that has a max age
+
+        returns
+        -------
+        result
+            the result as it is read back from the cache, json turns
+            number keys such as cpu numbers into text so a fresh result
+            looks the same as a cached one
+
+        """
+
+        # getters without a max age are never cached
+        if self.getter_max_age.get(getter, 0) <= 0:
+            return result
+
+        # results that cannot be stored as json are not cached
+        try:
+            serialized_result = json.dumps(result)
+        except (TypeError, ValueError):
+            return result
+
+        with self.lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO getter_cache VALUES (?, ?, ?, ?, ?)',
+                self._cache_key(session_key, getter, args, kwargs) + (time.time(), serialized_result))
+            self.connection.commit()
+
+        return json.loads(serialized_result)
+
+    def purge(self):
+        """ purge
+        removes the results that are older than the longest max age """
+
+        max_age = max(list(self.getter_max_age.values()) + [0])
+
+        with self.lock:
+            self.connection.execute('DELETE FROM getter_cache WHERE timestamp < ?',
+                                    (time.time() - max_age,))
+            self.connection.commit()
+
+    def close(self):
+        """ close
+        closes the cache """
+
+        with self.lock:
+            self.connection.close()
+
+class PooledSession:
+    """ pooled session
+    a napalm session held by the session pool
+    the lock makes sure only one getter runs over the session at a time """
+
+    def __init__(self, device, device_type):
+        # device the session belongs to
+        self.device = device
+        self.device_type = device_type
+
+        # open napalm driver, none until the session is opened
+        self.net_connect = None
+
+        # lock held while the session is in use
+        self.lock = threading.Lock()
+
+        # times of the last use and the last health check
+        self.last_used = time.time()
+        self.last_checked = time.time()
+
+class SessionPool:
+    """ session pool
+    holds authenticated napalm sessions and lends them to the scripts
+    sessions that stay idle for too long are closed and sessions that
+    have been idle for a while are health checked before they are used """
+
+    def __init__(self, idle_timeout=300, health_check_interval=30, getter_cache=None):
+        # seconds a session can stay idle before it is closed
+        self.idle_timeout = idle_timeout
+
+        # seconds a session can stay idle before it is health checked
+        self.health_check_interval = health_check_interval
+
+        # set up sessions datastructure
+        # keyed by device, device type and a hash of the credentials
+        self.sessions = {}
+
+        # lock protecting the sessions datastructure
+        self.lock = threading.Lock()
+
+        # getter cache, none if getter results are not cached
+        self.getter_cache = getter_cache
+
+    def _session_key(self, device, device_type, username, password, secret):
+        """ session key
+        builds the key of a session so that a session is only lent to
+        scripts that provide the same credentials it was opened with
+
+        returns
+        -------
+        session_key
+            tuple representing the device, device type and credential hash
+
+        """
+
+        # the credentials themselves are never stored in the key
+        credentials = '\n'.join([username, password, secret]).encode()
+        credential_hash = hashlib.sha256(credentials).hexdigest()
+
+        return device, device_type, credential_hash
+
+    def _open_session(self, pooled_session, username, password, secret):
+        """ open session
+        opens the napalm session of a pooled session """
+
+        # provide context for user
+        usr_msg = "Opening session to " + pooled_session.device.upper()
+        print(colorama.Fore.CYAN + usr_msg)
+
+        # initialize the driver for napalm
+        driver = napalm.get_network_driver(pooled_session.device_type)
+
+        # setup driver profile
+        net_connect = driver(
+            hostname=pooled_session.device,
+            username=username,
+            password=password,
+            optional_args={'secret': secret},
+        )
+
+        # open connection
+        net_connect.open()
+
+        pooled_session.net_connect = net_connect
+        pooled_session.last_checked = time.time()
+
+    def _close_session(self, pooled_session):
+        """ close session
+        closes the napalm session of a pooled session
+        errors are ignored as the session is usually already broken """
+
+        # nothing to close if the session was never opened
+        if pooled_session.net_connect is None:
+            return
+
+        try:
+            pooled_session.net_connect.close()
+        except Exception:
+            pass
+
+        pooled_session.net_connect = None
+
+    def _is_alive(self, pooled_session):
+        """ is alive
+        health checks the napalm session of a pooled session
+
+        returns
+        -------
+        is_alive
+            bool variable representing whether the session can still be used
+
+        """
+
+        try:
+            return pooled_session.net_connect.is_alive()['is_alive']
+        except Exception:
+            return False
+
+    def _borrow(self, device, device_type, username, password, secret):
+        """ borrow
+        finds the pooled session of the device and makes sure it is open
+        the lock of the returned session is held by the caller
+
+        returns
+        -------
+        pooled_session
+            the locked pooled session of the device
+
+        """
+
+        # find or create the pooled session of the device
+        session_key = self._session_key(device, device_type, username, password, secret)
+        while True:
+            with self.lock:
+                if session_key not in self.sessions:
+                    self.sessions[session_key] = PooledSession(device, device_type)
+
+                pooled_session = self.sessions[session_key]
+
+            # wait for any other script using the session
+            pooled_session.lock.acquire()
+
+            # the session may have been evicted while waiting
+            with self.lock:
+                if self.sessions.get(session_key) is pooled_session:
+                    break
+
+            pooled_session.lock.release()
+
+        try:
+            # health check sessions that have been idle for a while
+            if pooled_session.net_connect is not None:
+                if time.time() - pooled_session.last_checked > self.health_check_interval:
+                    if self._is_alive(pooled_session):
+                        pooled_session.last_checked = time.time()
+                    else:
+                        # provide context for user
+                        usr_msg = "Session to " + device.upper() + " failed its health check"
+                        print(colorama.Fore.RED + usr_msg)
+
+                        self._close_session(pooled_session)
+
+            # open the session if it is not open yet
+            if pooled_session.net_connect is None:
+                self._open_session(pooled_session, username, password, secret)
+
+        # release the session if it could not be opened
+        except Exception:
+            pooled_session.last_used = time.time()
+            pooled_session.lock.release()
+            raise
+
+        return pooled_session
+
+    def open(self, device, device_type, username, password, secret):
+        """ open
+        makes sure the session of the device is open in the pool
+        authentication failures are raised to the script """
+
+        # skip the login if the getter cache can still answer for the device
+        # the session is opened later if a getter turns out to be stale
+        if self.getter_cache is not None:
+            session_key = self._session_key(device, device_type, username, password, secret)
+            if self.getter_cache.is_fresh(session_key):
+                return
+
+        pooled_session = self._borrow(device, device_type, username, password, secret)
+        pooled_session.last_used = time.time()
+        pooled_session.lock.release()
+
+    def call(self, device, device_type, username, password, secret, getter, args=(), kwargs=None,
+             max_age=None):
+        """ call
+        runs a napalm getter or method over the pooled session of the device
+        a max age of 0 skips the getter cache and always asks the device
+
+        returns
+        -------
+        result
+            the result of the napalm getter or method
+
+        """
+
+        # only public napalm getters can be called through the pool
+        # configuration changes are refused as a candidate configuration
+        # would be shared with every script borrowing the same session
+        if getter.startswith('_') or getter in ('open', 'close') or getter in CONFIGURATION_METHODS:
+            raise ValueError('Method ' + getter + ' cannot be called through the session pool')
+
+        # answer from the getter cache if the last result is still fresh
+        # the device is not even logged into in that case
+        if self.getter_cache is not None:
+            session_key = self._session_key(device, device_type, username, password, secret)
+            result = self.getter_cache.get(session_key, getter, args, kwargs, max_age)
+            if result is not None:
+                return result
+
+        pooled_session = self._borrow(device, device_type, username, password, secret)
+
+        try:
+            result = getattr(pooled_session.net_connect, getter)(*args, **(kwargs or {}))
+
+            # a getter that succeeded is as good as a health check
+            pooled_session.last_checked = time.time()
+
+            # keep the result for the next script that asks for it
+            if self.getter_cache is not None:
+                result = self.getter_cache.put(session_key, getter, args, kwargs, result)
+
+            return result
+
+        # a session that failed halfway through is not lent again
+        except Exception:
+            self._close_session(pooled_session)
+            raise
+
+        finally:
+            pooled_session.last_used = time.time()
+            pooled_session.lock.release()
+
+    def status(self):
+        """ status
+        lists the sessions held by the pool
+
+        returns
+        -------
+        sessions
+            list representing every session in the pool
+            each entry is a tuple of device, device type, open flag and idle seconds
+
+        """
+
+        with self.lock:
+            return [(pooled_session.device, pooled_session.device_type,
+                     pooled_session.net_connect is not None,
+                     round(time.time() - pooled_session.last_used))
+                    for pooled_session in self.sessions.values()]
+
+    def evict_idle_sessions(self):
+        """ evict idle sessions
+        closes and removes the sessions that have been idle for too long """
+
+        with self.lock:
+            for session_key, pooled_session in list(self.sessions.items()):
+                # skip sessions that are still fresh
+                if time.time() - pooled_session.last_used < self.idle_timeout:
+                    continue
+
+                # skip sessions that are in use right now
+                if not pooled_session.lock.acquire(blocking=False):
+                    continue
+
+                try:
+                    # provide context for user
+                    if pooled_session.net_connect is not None:
+                        usr_msg = "Closing idle session to " + pooled_session.device.upper()
+                        print(colorama.Fore.MAGENTA + usr_msg)
+
+                    self._close_session(pooled_session)
+                    del self.sessions[session_key]
+                finally:
+                    pooled_session.lock.release()
+
+    def close_all(self):
+        """ close all
+        closes every session when the session pool is stopped """
+
+        with self.lock:
+            for pooled_session in self.sessions.values():
+                self._close_session(pooled_session)
+
+            self.sessions = {}
+
+class SessionPoolManager(BaseManager):
+    """ session pool manager
+    serves the session pool to the other scripts """
+
+def _evict_idle_sessions_forever(pool, interval):
+    """ evict idle sessions forever
+    background loop that keeps evicting idle sessions from the pool """
+
+    while True:
+        time.sleep(interval)
+        pool.evict_idle_sessions()
+
+        # drop getter results that can no longer be used
+        if pool.getter_cache is not None:
+            pool.getter_cache.purge()
+
+def session_pool():
+    """ main
+    main function that is the catalyst of the script by executing all
+    other functions """
+
+    # message to the user about the session pool script
+    usr_msg = "# Session Pool"
+    usr_msg += "\n# Keeps device sessions open between scripts!\n"
+    print(colorama.Fore.YELLOW + usr_msg)
+
+    # ask user how long sessions can stay idle
+    usr_msg = "Please provide the idle timeout of sessions in seconds (default 300): "
+    usr_inp = input(usr_msg).strip()
+    idle_timeout = int(usr_inp) if usr_inp.isdigit() and int(usr_inp) > 0 else 300
+
+    # open the getter cache with the freshness policy of the user
+    getter_cache = GetterCache('getter_cache.db', _read_getter_max_age('getter_max_age.txt'))
+
+    # message to the user about the freshness policy
+    for getter, max_age in sorted(getter_cache.getter_max_age.items()):
+        usr_msg = "Caching " + getter + " for " + str(max_age) + " seconds"
+        print(colorama.Fore.CYAN + usr_msg)
+
+    # initialize the session pool
+    pool = SessionPool(idle_timeout=idle_timeout, getter_cache=getter_cache)
+
+    # every script that connects gets the same session pool
+    SessionPoolManager.register('session_pool', callable=lambda: pool)
+
+    # generate a new key every time the session pool starts
+    authkey = secrets.token_hex(32).encode()
+
+    # initialize the server
+    manager = SessionPoolManager(address=SESSION_POOL_ADDRESS, authkey=authkey)
+    try:
+        server = manager.get_server()
+
+    # only one session pool can listen on the address
+    except OSError:
+        usr_msg = "\nAlert: The address is already in use."
+        usr_msg += " Is another session pool already running?\n"
+        print(colorama.Fore.RED + usr_msg)
+
+        return
+
+    # share the key with the scripts once the server is listening
+    _write_authkey(SESSION_POOL_KEYFILE, authkey)
+
+    # evict idle sessions in the background
+    eviction_interval = min(30, idle_timeout)
+    eviction_thread = threading.Thread(target=_evict_idle_sessions_forever,
+                                       args=(pool, eviction_interval), daemon=True)
+    eviction_thread.start()
+
+    # message to the user about the session pool running
+    usr_msg = "\nThe session pool is listening on " + SESSION_POOL_ADDRESS[0]
+    usr_msg += ":" + str(SESSION_POOL_ADDRESS[1]) + ". Press Ctrl+C to stop it.\n"
+    print(colorama.Fore.MAGENTA + usr_msg)
+
+    # serve scripts till the user stops the session pool
+    try:
+        server.serve_forever()
+
+    # close every session and remove the key file on the way out
+    finally:
+        pool.close_all()
+        getter_cache.close()
+
+        if os.path.exists(SESSION_POOL_KEYFILE):
+            os.remove(SESSION_POOL_KEYFILE)
+
+        # message to the user about the session pool ending
+        usr_msg = "\nThe Session Pool script has stopped running!\n"
+        print(colorama.Fore.MAGENTA + usr_msg)
+
+if __name__ == '__main__':
+    session_pool()